@@ -1,15 +1,27 @@
 import base64
-import io
+import numpy as np
+import requests
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import folium
-from PIL import Image
 from streamlit_folium import folium_static
 from datetime import datetime, timedelta, timezone
-from functions import (fetch_apod_data, display_folium_map, fetch_earth_imagery, fetch_eonet_events,
-                       fetch_asteroid_data, fetch_earth_assets, fetch_and_display_photos, get_camera_options,
-                       fetch_epic_data, process_eonet_data, create_ufo_image)
+from functions import (fetch_apod_data, display_folium_map, fetch_earth_scene, fetch_eonet_events,
+                       fetch_asteroid_frame, top_k, DISTANCE_UNITS, VELOCITY_UNITS,
+                       convert_distance, convert_velocity, approach_percentiles, daily_hazard_rates,
+                       nearest_approaches, fastest_approaches, fetch_neo_details, neo_orbit_frame,
+                       fetch_and_display_photos, fetch_and_display_all_photos, get_camera_options,
+                       fetch_epic_range, process_eonet_data, create_ufo_image, apod_archive_version,
+                       harvest_apod_archive, search_apod_archive, sample_apod_archive, apod_records,
+                       fetch_rover_manifest, sol_to_earth_date, earth_date_to_sol, rover_sol_cameras,
+                       rover_page_count, MARS_PHOTOS_PER_PAGE, CURIOSITY_LANDING_DATE, fetch_thumbnails,
+                       display_thumbnail_grid, eonet_store_state, display_eonet_map,
+                       EONET_MAP_CLUSTER_THRESHOLD, eonet_map_view, eonet_bbox_mask, eonet_radius_mask,
+                       eonet_category_counts, eonet_daily_counts, asteroid_size_points, scatter_render_mode,
+                       build_earth_mosaic, select_map_area, discover_earth_dates, fetch_earth_series,
+                       build_animation, EARTH_SERIES_MAX_FRAMES, fetch_earth_imagery_bytes, epic_image_url,
+                       build_epic_timelapse, EPIC_MAX_DAYS)
 
 # Set page config
 st.set_page_config(page_title="NASA Data Explorer", page_icon="🚀", layout="wide", initial_sidebar_state="expanded")
@@ -331,7 +343,8 @@ st.markdown('<p class="title">Space Explorer 🛸</p>', unsafe_allow_html=True)
 if api_choice == "APOD":
     st.header("Astronomy Picture of the Day")
 
-    apod_mode = st.radio("Select APOD mode:", ["Today's APOD", "Specific Date", "Date Range", "Random Images"])
+    apod_mode = st.radio("Select APOD mode:",
+                         ["Today's APOD", "Specific Date", "Date Range", "Random Images", "Search Archive"])
 
     current_date = datetime.now(tz=timezone.utc) - timedelta(days=1)
 
@@ -358,10 +371,44 @@ if api_choice == "APOD":
 
     elif apod_mode == "Random Images":
         count = st.number_input("Number of random images", min_value=1, max_value=100, value=5)
-        apod_data = fetch_apod_data(api_key, count=count)
+        # Sample from the local archive when we have one, otherwise ask the API
+        local_sample = sample_apod_archive(count)
+        if local_sample is not None:
+            apod_data = apod_records(local_sample)
+        else:
+            apod_data = fetch_apod_data(api_key, count=count)
+
+    elif apod_mode == "Search Archive":
+        if apod_archive_version() is None:
+            st.info("No local APOD archive yet. Download it once to search every picture since 1995.")
+        if st.button("Update local archive"):
+            progress_bar = st.progress(0.0, text="Downloading APOD archive...")
+            failed = harvest_apod_archive(api_key, progress=lambda done, total: progress_bar.progress(
+                done / total, text=f"Downloading APOD archive... {done}/{total} chunks"))
+            progress_bar.empty()
+            if failed:
+                st.warning(f"{len(failed)} chunks failed to download. Run the update again to resume.")
+            else:
+                st.success("Local APOD archive is up to date")
+
+        query = st.text_input("Search titles, explanations and credits", placeholder="e.g. horsehead nebula")
+        limit = st.slider("Maximum results", min_value=5, max_value=100, value=20, step=5)
+        apod_data = []
+        if query:
+            results = search_apod_archive(query, limit=limit)
+            if results is None:
+                st.warning("Download the local archive first.")
+            elif results.empty:
+                st.warning(f"No pictures match '{query}'")
+            else:
+                st.success(f"Top {len(results)} matches for '{query}'")
+                apod_data = apod_records(results)
 
     # Display APOD data
     if isinstance(apod_data, list):
+        # Every image's thumbnail at once, downloaded in parallel, before anything is drawn
+        thumbnails = fetch_thumbnails([item["url"] for item in apod_data
+                                       if "error" not in item and item.get("media_type") == "image"], 1024)
         for item in apod_data:
             if "error" in item:
                 st.error(item["error"]["message"])
@@ -370,8 +417,10 @@ if api_choice == "APOD":
 
                 if item["media_type"] == "image":
                     st.markdown('<div class="responsive-img-container">', unsafe_allow_html=True)
-                    st.image(item["url"], caption=item["title"], use_column_width=True)
+                    st.image(thumbnails.get(item["url"]) or item["url"], caption=item["title"],
+                             use_column_width=True)
                     st.markdown('</div>', unsafe_allow_html=True)
+                    st.markdown(f"[Full resolution]({item.get('hdurl') or item['url']})")
                 elif item["media_type"] == "video":
                     st.video(item["url"])
                 st.markdown(f"**Date:** {item['date']}")
@@ -388,36 +437,59 @@ elif api_choice == "Mars Rover Photos":
 
     rover = "Curiosity"  # We're focusing only on Curiosity
 
-    # Add information about the relationship between Sol and Earth date
-    st.info(
-        "Note: Sol 0 for Curiosity corresponds to August 6, 2012 (Earth date). Each Sol is approximately 24 hours and 39 minutes long.")
+    # The mission manifest gives the exact Earth date, photo count and cameras for every sol
+    manifest = fetch_rover_manifest(api_key, rover)
+    if "error" in manifest:
+        st.warning(f"{manifest['error']['message']}. Sol/Earth date conversions below are approximate.")
+        manifest = None
+    else:
+        st.info(f"{manifest['name']} has taken {manifest['total_photos']:,} photos over {manifest['max_sol']:,} "
+                f"sols (latest: {manifest['max_date']}). Each Sol is approximately 24 hours and 39 minutes long.")
 
     search_type = st.radio("Search by", ["Martian Sol", "Earth Date"])
 
     if search_type == "Martian Sol":
-        sol = st.number_input("Enter Sol (Martian day)", min_value=0, value=0, step=1)
-        # Calculate approximate Earth date
-        earth_date = datetime(2012, 8, 6) + timedelta(days=sol)
-        st.write(f"Approximate corresponding Earth date: {earth_date.strftime('%Y-%m-%d')}")
+        sol = st.number_input("Enter Sol (Martian day)", min_value=0,
+                              max_value=manifest["max_sol"] if manifest else None, value=0, step=1)
+        earth_date = sol_to_earth_date(manifest, sol)
+        st.write(f"Corresponding Earth date: {earth_date.strftime('%Y-%m-%d')}")
         date_param = f"sol={sol}"
+        has_photos = manifest is None or sol in manifest["sols"]
     else:
-        min_date = datetime(2012, 8, 6)
-        max_date = datetime.now()
+        min_date = manifest["landing_date"] if manifest else CURIOSITY_LANDING_DATE
+        max_date = manifest["max_date"] if manifest else datetime.now().date()
         earth_date = st.date_input("Select Earth Date", min_value=min_date, max_value=max_date, value=min_date)
-        # Calculate approximate Sol
-        sol = (earth_date - datetime(2012, 8, 6).date()).days
-        st.write(f"Approximate corresponding Sol: {sol}")
+        sol = earth_date_to_sol(manifest, earth_date)
+        st.write(f"Corresponding Sol: {sol}")
         date_param = f"earth_date={earth_date}"
+        has_photos = manifest is None or earth_date in manifest["dates"]
 
     cameras = get_camera_options()
+    sol_cameras = rover_sol_cameras(manifest, sol)
+
+    def camera_label(code):
+        if code == "All" or sol_cameras is None or code in sol_cameras:
+            return code
+        return f"{code} (no photos)"
 
-    camera = st.selectbox("Select Camera (optional)", ["All"] + list(cameras.keys()))
+    camera = st.selectbox("Select Camera (optional)", ["All"] + list(cameras.keys()), format_func=camera_label)
     camera_param = f"&camera={camera.lower()}" if camera != "All" else ""
 
-    page = st.number_input("Page", min_value=0, value=0, step=1, key="page_number")
+    page_count = rover_page_count(manifest, sol, camera) if has_photos else 0
+    if page_count == 0:
+        # Known to be empty, so don't bother asking the API
+        st.warning("No photos available for the selected criteria. Try different parameters.")
+    else:
+        if page_count is not None:
+            st.caption(f"{'Up to ' if camera != 'All' else ''}{page_count} pages of {MARS_PHOTOS_PER_PAGE} photos")
+        if st.toggle("Load all pages", help="Fetch every page in parallel and show photos as they arrive"):
+            fetch_and_display_all_photos(api_key, rover, date_param, camera_param, page_count)
+        else:
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1,
+                                   key=f"page_number_{date_param}_{camera}")
 
-    # Fetch photos when any parameter changes
-    fetch_and_display_photos(api_key, rover, date_param, camera_param, page)
+            # Fetch photos when any parameter changes
+            fetch_and_display_photos(api_key, rover, date_param, camera_param, page, page_count=page_count)
 
 
 elif api_choice == "Asteroids NeoWs":
@@ -431,25 +503,22 @@ elif api_choice == "Asteroids NeoWs":
 
     if start_date <= end_date:
         with st.spinner("Fetching asteroid data..."):
-            asteroid_data = fetch_asteroid_data(api_key, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+            neo_df, neo_listings, neo_index = fetch_asteroid_frame(api_key, start_date.strftime("%Y-%m-%d"),
+                                                                   end_date.strftime("%Y-%m-%d"))
 
-        if "error" in asteroid_data:
-            st.error(asteroid_data["error"]["message"])
+        if isinstance(neo_df, dict) and "error" in neo_df:
+            st.error(neo_df["error"]["message"])
         else:
-            asteroid_counts = []
-            all_asteroids = []
-            for date, asteroids in asteroid_data["near_earth_objects"].items():
-                asteroid_counts.append({"date": date, "count": len(asteroids)})
-                all_asteroids.extend(asteroids)
-
-            df = pd.DataFrame(asteroid_counts)
+            first_approaches = neo_df[neo_df["approach_index"] == 0]
+            df = first_approaches.groupby("feed_date").size().rename("count").reset_index()
+            df["date"] = df["feed_date"].dt.strftime("%Y-%m-%d")
 
             # Bar chart of asteroid counts
             fig = px.bar(df, x="date", y="count", title="Number of Near Earth Objects by Date")
             st.plotly_chart(fig, use_container_width=True)
 
-            total_asteroids = sum(df["count"])
-            hazardous_asteroids = sum(1 for asteroid in all_asteroids if asteroid["is_potentially_hazardous_asteroid"])
+            total_asteroids = len(first_approaches)
+            hazardous_asteroids = int(first_approaches["hazardous"].sum())
 
             col1, col2 = st.columns(2)
             with col1:
@@ -459,66 +528,131 @@ elif api_choice == "Asteroids NeoWs":
 
             # Asteroid size distribution with names
             st.subheader("Asteroid Size Distribution")
-            size_data = [{"name": asteroid["name"],
-                          "size": asteroid["estimated_diameter"]["meters"]["estimated_diameter_max"],
-                          "hazardous": asteroid["is_potentially_hazardous_asteroid"]}
-                         for asteroid in all_asteroids]
-            size_df = pd.DataFrame(size_data)
-            fig_size = px.scatter(size_df, x="size", y="name", color="hazardous",
-                                  labels={'size': 'Estimated Max Diameter (meters)', 'name': 'Asteroid Name',
+            size_df, size_total = asteroid_size_points(api_key, start_date.strftime("%Y-%m-%d"),
+                                                       end_date.strftime("%Y-%m-%d"))
+            size_df = size_df.rename(columns={"diameter_max_m": "size"})
+            fig_size = px.scatter(size_df, x="size", y="rank", color="hazardous", hover_name="name",
+                                  labels={'size': 'Estimated Max Diameter (meters)', 'rank': 'Size Rank',
                                           'hazardous': 'Potentially Hazardous'},
                                   title="Asteroid Sizes",
-                                  hover_data=["size"])
+                                  hover_data=["size"],
+                                  render_mode=scatter_render_mode(len(size_df)))
+            fig_size.update_yaxes(autorange="reversed")
             fig_size.update_layout(height=600)
             st.plotly_chart(fig_size, use_container_width=True)
+            if size_total > len(size_df):
+                st.caption(f"Showing {len(size_df)} of {size_total} asteroids, evenly spaced by size rank.")
 
             # Closest approaches
             st.subheader("Closest Approaches")
-            closest_approaches = sorted(all_asteroids, key=lambda x: float(
-                x["close_approach_data"][0]["miss_distance"]["kilometers"]))[:5]
-            for asteroid in closest_approaches:
-                st.write(f"Asteroid: {asteroid['name']}")
-                st.write(f"Close approach date: {asteroid['close_approach_data'][0]['close_approach_date']}")
-                st.write(
-                    f"Miss distance: {float(asteroid['close_approach_data'][0]['miss_distance']['kilometers']):.2f} km")
+            for approach in top_k(neo_df, "miss_distance_km", 5).itertuples():
+                st.write(f"Asteroid: {approach.name}")
+                st.write(f"Close approach date: {approach.approach_date:%Y-%m-%d}")
+                st.write(f"Miss distance: {approach.miss_distance_km:.2f} km")
                 st.write("---")
 
+            # Statistics over every close-approach record in the feed
+            @st.fragment
+            def approach_analytics(neo_df):
+                st.subheader("Close Approach Analytics")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    distance_unit = st.selectbox("Distance unit", list(DISTANCE_UNITS))
+                with col2:
+                    velocity_unit = st.selectbox("Velocity unit", list(VELOCITY_UNITS))
+                with col3:
+                    top_count = st.number_input("Approaches to list", min_value=1, max_value=100, value=10)
+
+                st.dataframe(approach_percentiles(neo_df, distance_unit=distance_unit, velocity_unit=velocity_unit),
+                             use_container_width=True)
+
+                hazard_df = daily_hazard_rates(neo_df)
+                fig_hazard = px.line(hazard_df, x="date", y="hazard_rate", hover_data=["approaches", "hazardous"],
+                                     labels={'hazard_rate': 'Share of approaches by hazardous objects', 'date': 'Date'},
+                                     title="Daily Hazard Rate")
+                fig_hazard.update_layout(yaxis_tickformat=".0%")
+                st.plotly_chart(fig_hazard, use_container_width=True)
+
+                def approach_table(approaches):
+                    return pd.DataFrame({
+                        "name": approaches["name"].to_numpy(),
+                        "date": approaches["approach_date"].dt.strftime("%Y-%m-%d").to_numpy(),
+                        f"miss distance ({distance_unit})": convert_distance(approaches["miss_distance_km"],
+                                                                              distance_unit),
+                        f"relative velocity ({velocity_unit})": convert_velocity(approaches["relative_velocity_kps"],
+                                                                                  velocity_unit),
+                        "hazardous": approaches["hazardous"].to_numpy(),
+                    })
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.write("**Nearest approaches**")
+                    st.dataframe(approach_table(nearest_approaches(neo_df, top_count)), hide_index=True)
+                with col2:
+                    st.write("**Fastest approaches**")
+                    st.dataframe(approach_table(fastest_approaches(neo_df, top_count)), hide_index=True)
+
             # Size comparison visualization
-            st.subheader("Asteroid Size Comparison")
-            selected_asteroids = st.multiselect("Select asteroids to compare",
-                                                options=[asteroid['name'] for asteroid in all_asteroids],
-                                                default=[asteroid['name'] for asteroid in all_asteroids[:5]])
-
-            if selected_asteroids:
-                comparison_data = [
-                    {
-                        "name": asteroid['name'],
-                        "size": asteroid["estimated_diameter"]["meters"]["estimated_diameter_max"],
-                        "hazardous": asteroid["is_potentially_hazardous_asteroid"]
-                    }
-                    for asteroid in all_asteroids if asteroid['name'] in selected_asteroids
-                ]
-                comparison_df = pd.DataFrame(comparison_data)
-                fig_comparison = px.bar(comparison_df, x="name", y="size", color="hazardous",
-                                        labels={'size': 'Estimated Max Diameter (meters)', 'name': 'Asteroid Name',
-                                                'hazardous': 'Potentially Hazardous'},
-                                        title="Asteroid Size Comparison")
-                fig_comparison.update_layout(xaxis={'categoryorder': 'total descending'})
-                st.plotly_chart(fig_comparison, use_container_width=True)
+            @st.fragment
+            def size_comparison(api_key, neo_listings, neo_index):
+                st.subheader("Asteroid Size Comparison")
+                asteroid_names = neo_listings["name"].tolist()
+                selected_asteroids = st.multiselect("Select asteroids to compare",
+                                                    options=asteroid_names,
+                                                    default=asteroid_names[:5])
+
+                if selected_asteroids:
+                    comparison_df = neo_listings.iloc[[neo_index[name] for name in selected_asteroids]]
+                    comparison_df = comparison_df[["name", "diameter_max_m", "hazardous"]].rename(
+                        columns={"diameter_max_m": "size"})
+                    fig_comparison = px.bar(comparison_df, x="name", y="size", color="hazardous",
+                                            labels={'size': 'Estimated Max Diameter (meters)', 'name': 'Asteroid Name',
+                                                    'hazardous': 'Potentially Hazardous'},
+                                            title="Asteroid Size Comparison")
+                    fig_comparison.update_layout(xaxis={'categoryorder': 'total descending'})
+                    st.plotly_chart(fig_comparison, use_container_width=True)
+
+                    # Orbital data for every selected asteroid, looked up concurrently
+                    selected_ids = neo_listings["id"].iloc[[neo_index[name] for name in selected_asteroids]]
+                    with st.spinner("Fetching orbital data..."):
+                        neo_details, failed_ids = fetch_neo_details(api_key, selected_ids)
+                    if failed_ids:
+                        st.warning(f"Could not fetch orbital data for {len(failed_ids)} asteroids")
+                    if neo_details:
+                        orbit_df = neo_orbit_frame(neo_details)
+                        fig_orbits = px.scatter(orbit_df, x="semi_major_axis", y="eccentricity", color="orbit_class",
+                                                hover_name="name", hover_data=["inclination", "orbital_period"],
+                                                labels={'semi_major_axis': 'Semi-major Axis (AU)',
+                                                        'eccentricity': 'Eccentricity', 'orbit_class': 'Orbit Class'},
+                                                title="Orbits of Selected Asteroids")
+                        st.plotly_chart(fig_orbits, use_container_width=True)
+                        st.dataframe(orbit_df.drop(columns=["id"]), hide_index=True)
 
             # Individual asteroid explorer
-            st.subheader("Explore Individual Asteroids")
-            selected_asteroid = st.selectbox("Select an asteroid", [asteroid['name'] for asteroid in all_asteroids])
-            asteroid_info = next(asteroid for asteroid in all_asteroids if asteroid['name'] == selected_asteroid)
-
-            col1, col2 = st.columns([1, 2])
-            with col1:
-                # Display a generic asteroid image
-                st.image(
-                    "https://imgs.search.brave.com/R4nwYmQBrjXwn9eFINYFwNCPWMftnLb8_MdiDwH55GI/rs:fit:500:0:0:0/g:ce/aHR0cHM6Ly93YWxs/cGFwZXJjYXZlLmNv/bS93cC9tS3FqVk82/LmpwZw",
-                    caption="Generic Asteroid Image (NASA)")
-            with col2:
-                st.json(asteroid_info)
+            @st.fragment
+            def asteroid_explorer(api_key, neo_listings, neo_index):
+                st.subheader("Explore Individual Asteroids")
+                asteroid_names = neo_listings["name"].tolist()
+                selected_asteroid = st.selectbox("Select an asteroid", asteroid_names)
+                asteroid_info = neo_listings.iloc[neo_index[selected_asteroid]] if selected_asteroid else None
+
+                col1, col2 = st.columns([1, 2])
+                with col1:
+                    # Display a generic asteroid image
+                    st.image(
+                        "https://imgs.search.brave.com/R4nwYmQBrjXwn9eFINYFwNCPWMftnLb8_MdiDwH55GI/rs:fit:500:0:0:0/g:ce/aHR0cHM6Ly93YWxs/cGFwZXJjYXZlLmNv/bS93cC9tS3FqVk82/LmpwZw",
+                        caption="Generic Asteroid Image (NASA)")
+                with col2:
+                    if asteroid_info is not None:
+                        neo_details, _ = fetch_neo_details(api_key, [asteroid_info["id"]])
+                        if asteroid_info["id"] in neo_details:
+                            st.json(neo_details[asteroid_info["id"]].get("orbital_data", {}))
+                        st.json(asteroid_info.to_json(date_format="iso"))
+
+            # Each section reruns on its own when its widgets change
+            approach_analytics(neo_df)
+            size_comparison(api_key, neo_listings, neo_index)
+            asteroid_explorer(api_key, neo_listings, neo_index)
 
     else:
         st.error("End date must be after start date")
@@ -526,31 +660,79 @@ elif api_choice == "Asteroids NeoWs":
 
 elif api_choice == "EPIC":
     st.header("Earth Polychromatic Imaging Camera (EPIC)")
-    date = st.date_input("Select a date", datetime.now() - timedelta(days=2))
+    if 'epic_timelapse' not in st.session_state:
+        st.session_state.epic_timelapse = None
 
-    epic_data = fetch_epic_data(api_key, date.strftime("%Y-%m-%d"))
+    latest_day = (datetime.now() - timedelta(days=2)).date()
+    selected_dates = st.date_input("Select a date range", [latest_day - timedelta(days=6), latest_day],
+                                   max_value=datetime.now().date())
+    start_day, end_day = (selected_dates[0], selected_dates[-1]) if selected_dates else (latest_day, latest_day)
 
-    if isinstance(epic_data, dict) and "error" in epic_data:
-        st.error(epic_data["error"]["message"])
-    elif len(epic_data) == 0:
-        st.warning(f"No EPIC images available for {date}")
+    if (end_day - start_day).days >= EPIC_MAX_DAYS:
+        st.error(f"Please choose a range of at most {EPIC_MAX_DAYS} days")
     else:
-        st.success(f"Found {len(epic_data)} EPIC images")
-        cols = st.columns(3)
-        for i, image in enumerate(epic_data[:9]):
-            with cols[i % 3]:
-                image_date = datetime.strptime(image["date"], "%Y-%m-%d %H:%M:%S")
-                formatted_date = image_date.strftime("%Y/%m/%d")
-                image_url = f"https://epic.gsfc.nasa.gov/archive/natural/{formatted_date}/png/{image['image']}.png"
-                st.image(image_url, caption=f"Date: {image['date']}")
-
-        # Create a map of image locations
-        latitudes = [float(image["centroid_coordinates"]["lat"]) for image in epic_data]
-        longitudes = [float(image["centroid_coordinates"]["lon"]) for image in epic_data]
-        df = pd.DataFrame({"lat": latitudes, "lon": longitudes})
-        fig = px.scatter_geo(df, lat="lat", lon="lon", projection="natural earth")
-        fig.update_layout(title="EPIC Image Locations")
-        st.plotly_chart(fig, use_container_width=True)
+        with st.spinner("Fetching EPIC data..."):
+            epic_data, failed_days = fetch_epic_range(api_key, start_day.strftime("%Y-%m-%d"),
+                                                      end_day.strftime("%Y-%m-%d"))
+
+        if failed_days:
+            st.warning(f"Could not fetch EPIC data for {', '.join(failed_days)}")
+        if len(epic_data) == 0:
+            st.warning(f"No EPIC images available for {start_day} to {end_day}")
+        else:
+            epic_days = sorted({image["date"][:10] for image in epic_data})
+            st.success(f"Found {len(epic_data)} EPIC images over {len(epic_days)} days")
+
+            # Picking another day only reruns the grid
+            @st.fragment
+            def epic_day_grid(epic_data, epic_days):
+                shown_day = epic_days[-1]
+                if len(epic_days) > 1:
+                    shown_day = st.select_slider("Day", options=epic_days, value=shown_day)
+                # Thumbnails come from the 1024px JPG variant; the full PNG is linked
+                display_thumbnail_grid([(epic_image_url(image, "jpg"), f"Date: {image['date']}", epic_image_url(image))
+                                        for image in epic_data if image["date"].startswith(shown_day)])
+
+            epic_day_grid(epic_data, epic_days)
+
+            # Create a map of image locations
+            df = pd.DataFrame({
+                "lat": [float(image["centroid_coordinates"]["lat"]) for image in epic_data],
+                "lon": [float(image["centroid_coordinates"]["lon"]) for image in epic_data],
+                "day": [image["date"][:10] for image in epic_data],
+            })
+            fig = px.scatter_geo(df, lat="lat", lon="lon", color="day", projection="natural earth")
+            fig.update_layout(title="EPIC Image Locations")
+            st.plotly_chart(fig, use_container_width=True)
+
+            # Timelapse of the whole range
+            @st.fragment
+            def epic_timelapse(epic_data, range_key):
+                st.subheader("Timelapse")
+                col1, col2 = st.columns(2)
+                with col1:
+                    timelapse_format = st.selectbox("Format", ["GIF", "WEBP"], key="epic_timelapse_format")
+                with col2:
+                    frames_per_second = st.slider("Frames per second", 1, 15, 5, key="epic_timelapse_fps")
+                if st.button("Build Timelapse"):
+                    with st.spinner("Building timelapse..."):
+                        animation = build_epic_timelapse(epic_data, timelapse_format, int(1000 / frames_per_second))
+                    if animation is None:
+                        st.error("Could not fetch any frames for the timelapse")
+                    else:
+                        st.session_state.epic_timelapse = (range_key, timelapse_format, animation)
+
+                if st.session_state.epic_timelapse is not None and st.session_state.epic_timelapse[0] == range_key:
+                    _, built_format, animation = st.session_state.epic_timelapse
+                    st.image(animation, caption=f"{range_key[0]} to {range_key[1]}")
+                    st.download_button(
+                        label="Download Timelapse",
+                        data=animation,
+                        file_name=f"epic_timelapse.{built_format.lower()}",
+                        mime=f"image/{built_format.lower()}"
+                    )
+
+            epic_timelapse(epic_data, (str(start_day), str(end_day)))
 
 elif api_choice == "Earth Imagery":
     st.header("Earth Imagery")
@@ -564,6 +746,12 @@ elif api_choice == "Earth Imagery":
         st.session_state.earth_image_assets = None
     if 'earth_image_params' not in st.session_state:
         st.session_state.earth_image_params = None
+    if 'earth_image_uri' not in st.session_state:
+        st.session_state.earth_image_uri = None
+    if 'earth_series' not in st.session_state:
+        st.session_state.earth_series = None
+    if 'earth_animation' not in st.session_state:
+        st.session_state.earth_animation = None
 
     col1, col2 = st.columns(2)
     with col1:
@@ -573,85 +761,173 @@ elif api_choice == "Earth Imagery":
 
     date = st.date_input("Select a date (YYYY-MM-DD)", datetime.now() - timedelta(days=30))
 
+    mode = st.radio("Mode", ["Single image", "Mosaic", "Time series"], horizontal=True,
+                    help="A mosaic stitches a grid of images together to cover a larger area. "
+                         "A time series collects every Landsat pass over the location in a date range.")
+
     # Add a slider for image resolution
     dim = st.slider("Image Resolution (degrees)", min_value=0.01, max_value=0.3, value=0.15, step=0.01,
                     help="Higher values result in a larger area but lower resolution. Lower values give higher resolution but cover a smaller area.")
 
-    col1 = st.columns(1)[0]
+    if mode != "Mosaic":
+        col1 = st.columns(1)[0]
 
-    with col1:
-        # Create a map to show the selected location
-        location_map = folium.Map(location=[lat, lon], zoom_start=4)
-        folium.Marker([lat, lon], popup="Selected Location").add_to(location_map)
-
-        # folium_static for better responsiveness
-        folium_static(location_map, width=300, height=200)
-
-    if st.button("Fetch Earth Imagery"):
-        with st.spinner("Fetching Earth imagery..."):
-            image_result, params = fetch_earth_imagery(api_key, lat, lon, date.strftime("%Y-%m-%d"), dim)
-            assets = fetch_earth_assets(api_key, lat, lon, date.strftime("%Y-%m-%d"))
-
-        if isinstance(image_result, dict) and "error" in image_result:
-            st.error(image_result["error"])
-        elif isinstance(image_result, Image.Image):
-            # Store the image, date, assets, and params in session state
-            st.session_state.earth_image = image_result
-            st.session_state.earth_image_date = date
-            st.session_state.earth_image_assets = assets
-            st.session_state.earth_image_params = params
-            st.success("Image fetched successfully!")
-        else:
-            st.error("Unexpected result when fetching the image. Please try again.")
+        with col1:
+            # Create a map to show the selected location
+            location_map = folium.Map(location=[lat, lon], zoom_start=4)
+            folium.Marker([lat, lon], popup="Selected Location").add_to(location_map)
+
+            # folium_static for better responsiveness
+            folium_static(location_map, width=300, height=200)
+
+    if mode == "Single image":
+        if st.button("Fetch Earth Imagery"):
+            with st.spinner("Fetching Earth imagery..."):
+                image_result, params, assets = fetch_earth_scene(api_key, lat, lon, date.strftime("%Y-%m-%d"), dim)
+
+            if "error" in image_result:
+                st.error(image_result["error"])
+            else:
+                # Only the display-sized preview is kept per session; the original stays in the shared cache
+                image_result["bounds"] = [[lat - dim / 2, lon - dim / 2], [lat + dim / 2, lon + dim / 2]]
+                st.session_state.earth_image = image_result
+                st.session_state.earth_image_date = date
+                st.session_state.earth_image_assets = assets
+                st.session_state.earth_image_params = params
+                st.session_state.earth_image_uri = (f"data:{image_result['preview_type']};base64,"
+                                                    f"{base64.b64encode(image_result['preview']).decode()}")
+                st.success("Image fetched successfully!")
+    elif mode == "Mosaic":
+        span = st.slider("Area size (degrees)", min_value=0.3, max_value=2.0, value=0.6, step=0.05,
+                         help="Width and height of the area around the selected location.")
+        st.caption("Or draw a rectangle on the map to choose the area.")
+        area = select_map_area(lat, lon, key="mosaic_area")
+        if area is None:
+            area = (lat - span / 2, lon - span / 2, lat + span / 2, lon + span / 2)
+
+        if st.button("Build Mosaic"):
+            progress_bar = st.progress(0.0)
+            mosaic = build_earth_mosaic(api_key, *area, date.strftime("%Y-%m-%d"), dim,
+                                        progress=lambda done, total: progress_bar.progress(
+                                            done / total, text=f"Fetched {done} of {total} tiles"))
+            progress_bar.empty()
+
+            if "error" in mosaic:
+                st.error(mosaic["error"])
+            else:
+                if mosaic["failed"]:
+                    st.warning(f"{len(mosaic['failed'])} of {mosaic['tiles']} tiles had no imagery and are left grey")
+                st.session_state.earth_image = mosaic
+                st.session_state.earth_image_date = date
+                st.session_state.earth_image_assets = None
+                st.session_state.earth_image_params = {"lat": lat, "lon": lon, "date": date.strftime("%Y-%m-%d"),
+                                                       "dim": dim}
+                st.session_state.earth_image_uri = (f"data:{mosaic['preview_type']};base64,"
+                                                    f"{base64.b64encode(mosaic['preview']).decode()}")
+                st.success(f"Mosaic built from {mosaic['tiles']} tiles!")
+
+    if mode == "Time series":
+        col1, col2 = st.columns(2)
+        with col1:
+            series_start = st.date_input("From", datetime.now() - timedelta(days=365))
+        with col2:
+            series_end = st.date_input("To", datetime.now() - timedelta(days=30))
+
+        if st.button("Fetch Time Series"):
+            with st.spinner("Finding Landsat passes..."):
+                pass_dates = discover_earth_dates(api_key, lat, lon, series_start.strftime("%Y-%m-%d"),
+                                                  series_end.strftime("%Y-%m-%d"), dim)
+            if not pass_dates:
+                st.warning("No Landsat passes found for this location and date range")
+            else:
+                if len(pass_dates) > EARTH_SERIES_MAX_FRAMES:
+                    st.info(f"Found {len(pass_dates)} passes; using the latest {EARTH_SERIES_MAX_FRAMES}")
+                progress_bar = st.progress(0.0)
+                series = fetch_earth_series(api_key, lat, lon, pass_dates, dim,
+                                            progress=lambda done, total: progress_bar.progress(
+                                                done / total, text=f"Fetched {done} of {total} scenes"))
+                progress_bar.empty()
+                if series["failed"]:
+                    st.warning(f"No imagery for {len(series['failed'])} of {len(pass_dates)} passes")
+                st.session_state.earth_series = series
+                st.session_state.earth_animation = None
+
+        # Scrubbing and animation settings only rerun this section
+        @st.fragment
+        def series_viewer(series):
+            st.subheader(f"{len(series['dates'])} Scenes")
+            shown = series["dates"][-1]
+            if len(series["dates"]) > 1:
+                shown = st.select_slider("Scene date", options=series["dates"], value=shown)
+            st.image(series["frames"][series["dates"].index(shown)], caption=f"Landsat 8 Imagery (Date: {shown})")
+
+            st.subheader("Animation")
+            col1, col2 = st.columns(2)
+            with col1:
+                animation_format = st.selectbox("Format", ["GIF", "WEBP"])
+            with col2:
+                frames_per_second = st.slider("Frames per second", 1, 10, 2)
+            if st.button("Build Animation"):
+                with st.spinner("Building animation..."):
+                    st.session_state.earth_animation = (animation_format, build_animation(
+                        series["frames"], animation_format, int(1000 / frames_per_second)))
+
+            if st.session_state.earth_animation is not None:
+                built_format, animation = st.session_state.earth_animation
+                st.image(animation, caption=f"{series['dates'][0]} to {series['dates'][-1]}")
+                st.download_button(
+                    label="Download Animation",
+                    data=animation,
+                    file_name=f"earth_timeseries.{built_format.lower()}",
+                    mime=f"image/{built_format.lower()}"
+                )
+
+        if st.session_state.earth_series and st.session_state.earth_series["frames"]:
+            series_viewer(st.session_state.earth_series)
 
     # Display the image if it exists in session state
-    if st.session_state.earth_image is not None:
-        st.image(st.session_state.earth_image, caption=f"Landsat 8 Imagery (Date: {st.session_state.earth_image_date})",
-                 use_column_width=True)
+    if mode != "Time series" and st.session_state.earth_image is not None:
+        st.image(st.session_state.earth_image["preview"],
+                 caption=f"Landsat 8 Imagery (Date: {st.session_state.earth_image_date})", use_column_width=True)
 
         # Display image information
         st.subheader("Image Information")
-        image_width, image_height = st.session_state.earth_image.size
+        image_width, image_height = st.session_state.earth_image["size"]
         st.write(f"Image dimensions: {image_width}x{image_height} pixels")
         st.write(f"Resolution: {st.session_state.earth_image_params['dim']} degrees")
 
-        approx_km = st.session_state.earth_image_params['dim'] * 111  # Approximate km per degree
-        st.write(f"Approximate area covered: {approx_km:.2f}km x {approx_km:.2f}km")
+        (south, west), (north, east) = st.session_state.earth_image["bounds"]
+        # Approximate km per degree
+        st.write(f"Approximate area covered: {(east - west) * 111:.2f}km x {(north - south) * 111:.2f}km")
 
         # Display image metadata
         if st.session_state.earth_image_assets is not None:
             st.subheader("Image Metadata")
             st.json(st.session_state.earth_image_assets)
 
-        # Convert PIL Image to bytes for download
-        img_byte_arr = io.BytesIO()
-        st.session_state.earth_image.save(img_byte_arr, format='PNG')
-        img_byte_arr = img_byte_arr.getvalue()
-
-        # Provide a download button for the image
-        st.download_button(
-            label="Download Image",
-            data=img_byte_arr,
-            file_name="earth_imagery.png",
-            mime="image/png"
-        )
+        # Provide a download button for the image; single images are read back from the cache only on request
+        extension = st.session_state.earth_image["content_type"].split("/")[-1]
+        download = st.session_state.earth_image.get("content")
+        if download is None and st.button("Prepare full-resolution download"):
+            try:
+                download, _ = fetch_earth_imagery_bytes(api_key, *st.session_state.earth_image["source"])
+            except (requests.RequestException, IOError) as e:
+                st.error(f"Failed to fetch image: {e}")
+        if download is not None:
+            st.download_button(
+                label="Download Image",
+                data=download,
+                file_name=f"earth_imagery.{extension}",
+                mime=st.session_state.earth_image["content_type"]
+            )
 
         # Create a base map for the image overlay
-        m = folium.Map(location=[lat, lon], zoom_start=10)
-
-        # Convert PIL Image to base64 for Folium
-        buffered = io.BytesIO()
-        st.session_state.earth_image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        m = folium.Map(location=[(south + north) / 2, (west + east) / 2], zoom_start=10 if north - south < 0.5 else 8)
 
         # Add image overlay to the map
-        img_bounds = [
-            [lat - st.session_state.earth_image_params['dim'] / 2,
-             lon - st.session_state.earth_image_params['dim'] / 2],
-            [lat + st.session_state.earth_image_params['dim'] / 2, lon + st.session_state.earth_image_params['dim'] / 2]
-        ]
+        img_bounds = st.session_state.earth_image["bounds"]
         folium.raster_layers.ImageOverlay(
-            image=f"data:image/png;base64,{img_str}",
+            image=st.session_state.earth_image_uri,
             bounds=img_bounds,
             opacity=0.6,
             name="Landsat 8 Image"
@@ -683,6 +959,10 @@ elif api_choice == "EONET":
             eonet_data = fetch_eonet_events(limit=limit, days=days, status=status)
             st.session_state.eonet_data = eonet_data
 
+    eonet_state = eonet_store_state()
+    if "synced_at" in eonet_state:
+        st.caption(f"Local event store last synced {eonet_state['synced_at'][:16].replace('T', ' ')} UTC")
+
     if st.session_state.eonet_data:
         eonet_data = st.session_state.eonet_data
         if "events" in eonet_data:
@@ -692,61 +972,83 @@ elif api_choice == "EONET":
                 st.success(f"Successfully fetched {len(events_df)} events")
 
                 # Event categories pie chart
-                fig = px.pie(events_df, names="category", title="Event Categories")
+                fig = px.pie(eonet_category_counts(events_df), names="category", values="count",
+                             title="Event Categories")
                 st.plotly_chart(fig, use_container_width=True)
 
                 # Event timeline
-                events_df['date'] = pd.to_datetime(events_df['date'])
-                fig_timeline = px.histogram(events_df, x="date", color="category", title="Event Timeline")
+                fig_timeline = px.bar(eonet_daily_counts(events_df), x="date", y="count", color="category",
+                                      title="Event Timeline")
                 st.plotly_chart(fig_timeline, use_container_width=True)
 
-                # Filtering options
-                st.subheader("Filter Events")
-                selected_categories = st.multiselect("Select categories",
-                                                     options=sorted(events_df["category"].unique()))
-                min_date = events_df["date"].min().date()
-                max_date = events_df["date"].max().date()
-                date_range = st.date_input("Select date range", [min_date, max_date])
-
-                # Apply filters
-                filtered_df = events_df
-                if selected_categories:
-                    filtered_df = filtered_df[filtered_df["category"].isin(selected_categories)]
-                filtered_df = filtered_df[
-                    (filtered_df["date"].dt.date >= date_range[0]) & (filtered_df["date"].dt.date <= date_range[1])]
-
-                # Map of events
-                st.subheader("Event Map")
-                m = folium.Map(location=[0, 0], zoom_start=2)
-                for _, event in filtered_df.iterrows():
-                    folium.Marker(
-                        location=[event["lat"], event["lon"]],
-                        popup=f"<b>{event['title']}</b><br>Date: {event['date']}<br><a href='{event['source']}' target='_blank'>More Info</a>",
-                        tooltip=f"{event['category']}: {event['title']}"
-                    ).add_to(m)
-                folium_static(m, width=700, height=500)
-
-                # Events table
-                st.subheader("Filtered Events")
-                st.dataframe(filtered_df[["title", "category", "date", "source"]])
-
-                # Download CSV
-                csv = filtered_df.to_csv(index=False)
-                st.download_button(
-                    label="Download filtered events as CSV",
-                    data=csv,
-                    file_name="eonet_events_filtered.csv",
-                    mime="text/csv",
-                )
-
-                # Explore Individual Events
-                st.subheader("Explore Individual Events")
-                event_options = filtered_df['title'].tolist()
-                selected_event = st.selectbox("Select an event", event_options, key="event_selectbox")
-
-                if selected_event:
-                    event_info = filtered_df[filtered_df['title'] == selected_event].iloc[0]
-                    st.json(event_info.to_dict())
+                # Individual event details; rerun on their own when another event is picked
+                @st.fragment
+                def event_explorer(filtered_df):
+                    st.subheader("Explore Individual Events")
+                    event_options = filtered_df['title'].tolist()
+                    selected_event = st.selectbox("Select an event", event_options, key="event_selectbox")
+
+                    if selected_event:
+                        event_info = filtered_df[filtered_df['title'] == selected_event].iloc[0]
+                        st.json(event_info.to_dict())
+
+                # Filters, map and table rerun together, without rebuilding the charts above
+                @st.fragment
+                def event_filters(events_df):
+                    st.subheader("Filter Events")
+                    selected_categories = st.multiselect("Select categories",
+                                                         options=sorted(events_df["category"].unique()))
+                    min_date = events_df["date"].min().date()
+                    max_date = events_df["date"].max().date()
+                    date_range = st.date_input("Select date range", [min_date, max_date])
+
+                    st.markdown("**Location**")
+                    near_location = st.checkbox("Only events near a location")
+                    if near_location:
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            near_lat = st.number_input("Latitude", -90.0, 90.0, 0.0, key="eonet_near_lat")
+                        with col2:
+                            near_lon = st.number_input("Longitude", -180.0, 180.0, 0.0, key="eonet_near_lon")
+                        with col3:
+                            radius_km = st.slider("Radius (km)", 50, 5000, 500, step=50)
+                    in_map_view = st.checkbox("Only events in the current map view")
+
+                    # Apply filters
+                    mask = np.ones(len(events_df), dtype=bool)
+                    if selected_categories:
+                        mask &= events_df["category"].isin(selected_categories).to_numpy()
+                    event_dates = events_df["date"].dt.date
+                    mask &= ((event_dates >= date_range[0]) & (event_dates <= date_range[1])).to_numpy()
+                    if near_location:
+                        mask &= eonet_radius_mask(events_df, near_lat, near_lon, radius_km)
+                    if in_map_view:
+                        mask &= eonet_bbox_mask(events_df, eonet_map_view()[1])
+                    filtered_df = events_df[mask]
+
+                    # Map of events
+                    st.subheader("Event Map")
+                    in_view = display_eonet_map(events_df, mask)
+                    if in_view > EONET_MAP_CLUSTER_THRESHOLD:
+                        st.caption(f"{in_view} events in view, grouped into clusters. "
+                                   "Zoom in to see individual events.")
+
+                    # Events table
+                    st.subheader("Filtered Events")
+                    st.dataframe(filtered_df[["title", "category", "date", "source"]])
+
+                    # Download CSV
+                    csv = filtered_df.to_csv(index=False)
+                    st.download_button(
+                        label="Download filtered events as CSV",
+                        data=csv,
+                        file_name="eonet_events_filtered.csv",
+                        mime="text/csv",
+                    )
+
+                    event_explorer(filtered_df)
+
+                event_filters(events_df)
 
             else:
                 st.warning("No events found for the specified criteria.")
@@ -1,35 +1,667 @@
 import base64
+import hashlib
 import io
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from tenacity import (retry, retry_if_exception_type, retry_if_result, stop_after_attempt,
+                      wait_random_exponential)
 from PIL import Image, ImageDraw
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
 from datetime import datetime, timedelta
 from io import BytesIO
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import folium
+from folium.plugins import Draw
 from streamlit_folium import st_folium
 
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
+# HTTP client settings (override with environment variables)
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("NASA_HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.environ.get("NASA_HTTP_READ_TIMEOUT", 30))
+HTTP_MAX_ATTEMPTS = int(os.environ.get("NASA_HTTP_MAX_ATTEMPTS", 4))
+HTTP_POOL_SIZE = int(os.environ.get("NASA_HTTP_POOL_SIZE", 32))
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+HTTP_MAX_RETRY_AFTER = float(os.environ.get("NASA_HTTP_MAX_RETRY_AFTER", 5))
+
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session():
+    # One keep-alive session per server process. A plain module global rather than st.cache_resource
+    # so background worker threads (which have no Streamlit script context) can use it too.
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                # One connection pool per host, shared by every Streamlit worker thread
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Accept-Encoding": "gzip, deflate", "User-Agent": "nasa-data-explorer"})
+                _http_session = session
+    return _http_session
+
+
+def _last_attempt(retry_state):
+    # Once retries run out hand back the final response (or re-raise its exception)
+    return retry_state.outcome.result()
+
+
+def _retry_after_seconds(value):
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_backoff = wait_random_exponential(multiplier=0.5, max=10)
+
+
+def _outcome_retry_after(retry_state):
+    outcome = retry_state.outcome
+    if outcome is None or outcome.failed:
+        return None
+    return _retry_after_seconds(outcome.result().headers.get("Retry-After"))
+
+
+def _retry_after_too_long(retry_state):
+    # An exhausted quota (Retry-After of minutes or hours) goes straight back to the caller,
+    # which can serve something stale instead of blocking a worker thread
+    seconds = _outcome_retry_after(retry_state)
+    return seconds is not None and seconds > HTTP_MAX_RETRY_AFTER
+
+
+def _retry_wait(retry_state):
+    # Exponential backoff, unless the server said how long to wait
+    seconds = _outcome_retry_after(retry_state)
+    if seconds is not None:
+        return seconds
+    return _backoff(retry_state)
+
+
+def _close_discarded(retry_state):
+    # A response that's about to be retried is never read; give its connection back to the pool
+    outcome = retry_state.outcome
+    if outcome is not None and not outcome.failed:
+        outcome.result().close()
+
+
+@retry(retry=(retry_if_exception_type((requests.ConnectionError, requests.Timeout)) |
+              retry_if_result(lambda response: response.status_code in RETRY_STATUS_CODES)),
+       stop=stop_after_attempt(HTTP_MAX_ATTEMPTS) | _retry_after_too_long,
+       wait=_retry_wait,
+       before_sleep=_close_discarded,
+       retry_error_callback=_last_attempt)
+def http_get(url, params=None, timeout=None, **kwargs):
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    return get_http_session().get(url, params=params, timeout=timeout, **kwargs)
+
+
+# Persistent response cache (shared by every server process on this host)
+RESPONSE_CACHE_DIR = os.environ.get("NASA_CACHE_DIR",
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("NASA_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+RESPONSE_CACHE_DEFAULT_TTL = 3600
+# Time-to-live in seconds, matched against the request path
+RESPONSE_CACHE_TTLS = {
+    "/planetary/apod": 3600,
+    "/neo/rest/v1/feed": 3600,
+    "/neo/rest/v1/neo/": 30 * 24 * 3600,  # Orbital elements barely change
+    "/EPIC/api/": 6 * 3600,
+    "/mars-photos/api/v1/manifests/": 6 * 3600,
+    "/mars-photos/api/": 6 * 3600,
+    "/planetary/earth/assets": 24 * 3600,
+    "/api/v3/events": 15 * 60,
+}
+# Credentials never identify the data, so they're left out of cache keys
+CACHE_KEY_EXCLUDED_PARAMS = {"api_key"}
+
+_cache_local = threading.local()
+
+
+def _cache_db():
+    # SQLite connections can't be shared between threads, so keep one per thread
+    conn = getattr(_cache_local, "conn", None)
+    if conn is None:
+        os.makedirs(RESPONSE_CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(RESPONSE_CACHE_DIR, "responses.sqlite3"), timeout=30,
+                               isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                            key TEXT PRIMARY KEY,
+                            url TEXT NOT NULL,
+                            body BLOB NOT NULL,
+                            etag TEXT,
+                            last_modified TEXT,
+                            expires_at REAL NOT NULL,
+                            accessed_at REAL NOT NULL,
+                            size INTEGER NOT NULL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        conn.execute("""CREATE TABLE IF NOT EXISTS thumbnails (
+                            key TEXT PRIMARY KEY,
+                            body BLOB NOT NULL,
+                            accessed_at REAL NOT NULL,
+                            size INTEGER NOT NULL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS thumbnails_accessed_at ON thumbnails (accessed_at)")
+        # Earth imagery exactly as downloaded, keyed by location, date and dim
+        conn.execute("""CREATE TABLE IF NOT EXISTS imagery (
+                            key TEXT PRIMARY KEY,
+                            body BLOB NOT NULL,
+                            content_type TEXT NOT NULL,
+                            accessed_at REAL NOT NULL,
+                            size INTEGER NOT NULL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS imagery_accessed_at ON imagery (accessed_at)")
+        # Local EONET event store: one row per event id plus the sync state
+        conn.execute("""CREATE TABLE IF NOT EXISTS eonet_events (
+                            id TEXT PRIMARY KEY,
+                            body BLOB NOT NULL,
+                            first_date TEXT NOT NULL,
+                            last_date TEXT NOT NULL,
+                            closed TEXT)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS eonet_events_last_date ON eonet_events (last_date)")
+        conn.execute("CREATE TABLE IF NOT EXISTS eonet_sync (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # One row per APOD date; body is NULL for dates with no picture, expires_at NULL means never
+        conn.execute("""CREATE TABLE IF NOT EXISTS apod_days (
+                            date TEXT PRIMARY KEY,
+                            body BLOB,
+                            expires_at REAL)""")
+        _cache_local.conn = conn
+    return conn
+
+
+def normalize_cache_key(url, params=None):
+    # Same endpoint + same params (in any order, inline or not) -> same key
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query += [(k, str(v)) for k, v in (params or {}).items() if v is not None]
+    query = [(k, v) for k, v in query if k not in CACHE_KEY_EXCLUDED_PARAMS]
+    path = parts.path.rstrip("/") or "/"
+    normalized = f"{parts.scheme}://{parts.netloc.lower()}{path}?{urlencode(sorted(query))}"
+    return hashlib.sha256(normalized.encode()).hexdigest(), normalized
+
+
+def _cache_ttl(url):
+    path = urlsplit(url).path
+    for prefix, ttl in RESPONSE_CACHE_TTLS.items():
+        if prefix in path:
+            return ttl
+    return RESPONSE_CACHE_DEFAULT_TTL
+
+
+def _evict_cache_entries(conn, table="responses", max_bytes=RESPONSE_CACHE_MAX_BYTES):
+    total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+    if total <= max_bytes:
+        return
+    # Drop least recently used entries until we're back under 90% of the cap
+    target = total - int(max_bytes * 0.9)
+    freed = 0
+    for key, size in conn.execute(f"SELECT key, size FROM {table} ORDER BY accessed_at").fetchall():
+        if freed >= target:
+            break
+        conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+        freed += size
+
+
+def cached_get_json(url, params=None, ttl=None):
+    key, normalized = normalize_cache_key(url, params)
+    conn = _cache_db()
+    now = time.time()
+    row = conn.execute("SELECT body, etag, last_modified, expires_at FROM responses WHERE key = ?",
+                       (key,)).fetchone()
+
+    if row is not None and row[3] > now:
+        conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(zlib.decompress(row[0]))
+
+    if ttl is None:
+        ttl = _cache_ttl(url)
+
+    # Expired entries are revalidated so an unchanged resource only costs a 304
+    headers = {}
+    if row is not None:
+        if row[1]:
+            headers["If-None-Match"] = row[1]
+        if row[2]:
+            headers["If-Modified-Since"] = row[2]
+
+    try:
+        response = http_get(url, params=params, headers=headers)
+    except requests.RequestException:
+        if row is not None:
+            return json.loads(zlib.decompress(row[0]))  # Serve stale data rather than an error
+        raise
+
+    if response.status_code == 304 and row is not None:
+        conn.execute("UPDATE responses SET expires_at = ?, accessed_at = ? WHERE key = ?", (now + ttl, now, key))
+        return json.loads(zlib.decompress(row[0]))
+    if response.status_code in RETRY_STATUS_CODES and row is not None:
+        return json.loads(zlib.decompress(row[0]))
+
+    response.raise_for_status()
+    data = response.json()
+    body = zlib.compress(response.content)
+    conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                 (key, normalized, body, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                  now + ttl, now, len(body)))
+    _evict_cache_entries(conn)
+    return data
+
+
+# Offline query layer: historical queries are answered from local Parquet datasets (memory-mapped,
+# with filters pushed down to partitions and row groups) and only fall back to the API when the
+# requested range isn't covered locally
+_local_cache = {}
+_local_cache_lock = threading.Lock()
+
+
+def _path_version(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cached_local(key, version, loader):
+    # Module-level rather than st.cache_resource so background threads can use it too
+    with _local_cache_lock:
+        entry = _local_cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+    value = loader()
+    with _local_cache_lock:
+        _local_cache[key] = (version, value)
+    return value
+
+
+def open_local_dataset(path, partitioning="hive"):
+    # A new partition changes the directory's mtime, which triggers a fresh file listing
+    version = _path_version(path)
+    if version is None:
+        return None
+    return _cached_local(("dataset", path), version,
+                         lambda: ds.dataset(path, format="parquet", partitioning=partitioning,
+                                            filesystem=pafs.LocalFileSystem(use_mmap=True)))
+
+
+def query_local_dataset(path, filter=None, columns=None, partitioning="hive"):
+    dataset = open_local_dataset(path, partitioning)
+    if dataset is None:
+        return None
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+# Thumbnails for the image grids, so browsers download kilobytes instead of full-size originals
+THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get("NASA_THUMBNAIL_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+THUMBNAIL_SIZE = 400
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_WORKERS = 8
+
+
+def make_thumbnail(content, max_size=THUMBNAIL_SIZE, image_format=THUMBNAIL_FORMAT):
+    image = Image.open(BytesIO(content))
+    # For JPEGs draft() lets the decoder scale down by 1/2, 1/4 or 1/8 instead of decoding every pixel
+    image.draft("RGB", (max_size, max_size))
+    image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    if image_format == "JPEG" and image.mode == "RGBA":
+        image = image.convert("RGB")
+    output = BytesIO()
+    image.save(output, format=image_format, quality=80)
+    return output.getvalue()
+
+
+def fetch_thumbnail(url, max_size=THUMBNAIL_SIZE):
+    key = hashlib.sha256(f"{url}|{max_size}|{THUMBNAIL_FORMAT}".encode()).hexdigest()
+    conn = _cache_db()
+    row = conn.execute("SELECT body FROM thumbnails WHERE key = ?", (key,)).fetchone()
+    if row is not None:
+        conn.execute("UPDATE thumbnails SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    try:
+        response = http_get(url)
+        response.raise_for_status()
+        thumbnail = make_thumbnail(response.content, max_size)
+    except (requests.RequestException, IOError, ValueError):
+        return None  # Callers fall back to the original URL
+    conn.execute("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?)", (key, thumbnail, time.time(), len(thumbnail)))
+    _evict_cache_entries(conn, table="thumbnails", max_bytes=THUMBNAIL_CACHE_MAX_BYTES)
+    return thumbnail
+
+
+def fetch_thumbnails(urls, max_size=THUMBNAIL_SIZE, max_workers=THUMBNAIL_WORKERS):
+    unique_urls = list(dict.fromkeys(urls))
+    if not unique_urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_urls))) as pool:
+        thumbnails = pool.map(lambda url: fetch_thumbnail(url, max_size), unique_urls)
+        return dict(zip(unique_urls, thumbnails))
+
+
+def display_thumbnail_grid(tiles, columns=3, max_size=THUMBNAIL_SIZE):
+    # tiles are (image url, caption) pairs, or (image url, caption, full resolution url) when a
+    # smaller variant of the image is available; the full-size original is only a link away
+    thumbnails = fetch_thumbnails([tile[0] for tile in tiles], max_size)
+    cols = st.columns(columns)
+    for i, tile in enumerate(tiles):
+        url, caption = tile[:2]
+        with cols[i % columns]:
+            st.image(thumbnails.get(url) or url, caption=caption)
+            st.markdown(f"[Full resolution]({tile[2] if len(tile) > 2 else url})")
+
+
+# The leading underscore keeps the API key out of Streamlit's cache key, so every
+# user shares one cached copy. Errors are raised rather than returned so that one
+# user's bad key or exhausted quota never gets cached for everyone else.
+@st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
+def _shared_get_json(url, params, _api_key):
+    return cached_get_json(url, params=dict(params, api_key=_api_key))
+
+
+APOD_URL = "https://api.nasa.gov/planetary/apod"
+APOD_RECENT_TTL = 3600  # Today's picture can still be edited, older ones never change
+APOD_RECENT_DAYS = 2
+
+
+def _apod_day_expiry(day, now):
+    if day >= datetime.utcnow().date() - timedelta(days=APOD_RECENT_DAYS):
+        return now + APOD_RECENT_TTL
+    return None
+
+
+def _store_apod_days(items, requested_days=()):
+    now = time.time()
+    rows = {}
+    for day in requested_days:
+        rows[day] = None  # Requested but not returned -> a day without a picture
+    for item in items:
+        if isinstance(item, dict) and "date" in item:
+            rows[datetime.strptime(item["date"], "%Y-%m-%d").date()] = item
+    _cache_db().executemany("INSERT OR REPLACE INTO apod_days VALUES (?, ?, ?)",
+                            [(day.isoformat(), None if item is None else zlib.compress(json.dumps(item).encode()),
+                              _apod_day_expiry(day, now)) for day, item in rows.items()])
+
+
+def _load_apod_days(first_day, last_day):
+    rows = _cache_db().execute("SELECT date, body FROM apod_days WHERE date BETWEEN ? AND ? "
+                               "AND (expires_at IS NULL OR expires_at > ?)",
+                               (first_day.isoformat(), last_day.isoformat(), time.time())).fetchall()
+    return {datetime.strptime(date, "%Y-%m-%d").date(): None if body is None else json.loads(zlib.decompress(body))
+            for date, body in rows}
+
+
+def _missing_spans(days, cached):
+    # Group the uncached days into contiguous (start, end) spans
+    spans = []
+    for day in days:
+        if day in cached:
+            continue
+        if spans and spans[-1][1] == day - timedelta(days=1):
+            spans[-1][1] = day
+        else:
+            spans.append([day, day])
+    return spans
+
+
+def fetch_apod_range(api_key, start_date, end_date=None):
+    first_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+    last_day = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else datetime.utcnow().date()
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+
+    cached = _load_apod_days(first_day, last_day)
+    if len(cached) < len(days):
+        local_days = query_local_apod_days(first_day, last_day, exclude=cached)
+        if local_days:
+            # Copy them into the per-day store so the archive can always be rebuilt from it
+            _store_apod_days([item for item in local_days.values() if item], requested_days=local_days)
+            cached.update(local_days)
+    for span_start, span_end in _missing_spans(days, cached):
+        params = {"start_date": span_start.isoformat(), "end_date": span_end.isoformat(), "thumbs": "true",
+                  "api_key": api_key}
+        response = http_get(APOD_URL, params=params)
+        response.raise_for_status()
+        items = response.json()
+        span_days = [day for day in days if span_start <= day <= span_end]
+        _store_apod_days(items, requested_days=span_days)
+        cached.update(_load_apod_days(span_start, span_end))
+
+    return [cached[day] for day in days if cached.get(day) is not None]
+
+
 def fetch_apod_data(api_key, date=None, start_date=None, end_date=None, count=None, thumbs=False):
-    url = f"https://api.nasa.gov/planetary/apod?api_key={api_key}"
-    params = {}
-    if date:
-        params['date'] = date
-    if start_date:
-        params['start_date'] = start_date
-    if end_date:
-        params['end_date'] = end_date
-    if count:
-        params['count'] = count
-    if thumbs:
-        params['thumbs'] = 'true'
-
-    response = requests.get(url, params=params)
-    return response.json()
+    # thumbs is kept for compatibility; the per-day store always asks for thumbnails
+    try:
+        if date:
+            items = fetch_apod_range(api_key, date, date)
+            return items[0] if items else {"error": {"message": f"No APOD available for {date}"}}
+        if start_date:
+            return fetch_apod_range(api_key, start_date, end_date)
+
+        params = {"thumbs": "true"}
+        if count:
+            params['count'] = count
+        data = _shared_get_json(APOD_URL, params, api_key)
+        # Today's and random pictures also warm the per-day store
+        _store_apod_days(data if isinstance(data, list) else [data])
+        return data
+    except (requests.RequestException, ValueError) as e:
+        return {"error": {"message": f"Failed to fetch data: {str(e)}"}}
+
+
+# Local APOD archive (Parquet) with a keyword index over it
+APOD_FIRST_DAY = datetime(1995, 6, 16).date()
+APOD_ARCHIVE_PATH = os.path.join(RESPONSE_CACHE_DIR, "apod_archive.parquet")
+APOD_ARCHIVE_COLUMNS = ["date", "title", "explanation", "copyright", "media_type", "url", "hdurl",
+                        "thumbnail_url"]
+APOD_SEARCH_FIELDS = {"title": 3.0, "copyright": 2.0, "explanation": 1.0}  # Field weights
+SEARCH_STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "its", "of",
+                    "on", "or", "that", "the", "this", "to", "was", "with"}
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def harvest_apod_archive(api_key, chunk_days=90, max_workers=4, progress=None):
+    # Days already in the per-day store are skipped, so an interrupted harvest just picks up where it stopped
+    last_day = datetime.utcnow().date() - timedelta(days=1)
+    chunks = []
+    chunk_start = APOD_FIRST_DAY
+    while chunk_start <= last_day:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), last_day)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch_apod_range, api_key, start.isoformat(), end.isoformat()): (start, end)
+                   for start, end in chunks}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                future.result()
+            except (requests.RequestException, ValueError):
+                failed.append(futures[future])
+            if progress:
+                progress(done, len(chunks))
+
+    # The archive is complete up to the first chunk that failed, but recent days can still be posted late
+    # or edited, so they're left to the short-lived per-day entries rather than frozen into the archive
+    covered_through = min(failed)[0] - timedelta(days=1) if failed else last_day
+    covered_through = min(covered_through, datetime.utcnow().date() - timedelta(days=APOD_RECENT_DAYS + 1))
+    export_apod_archive(covered_through)
+    return sorted(failed)
+
+
+def export_apod_archive(covered_through=None):
+    rows = _cache_db().execute("SELECT body FROM apod_days WHERE body IS NOT NULL ORDER BY date").fetchall()
+    items = [json.loads(zlib.decompress(body)) for (body,) in rows]
+    archive = pd.DataFrame(items).reindex(columns=APOD_ARCHIVE_COLUMNS)
+    archive["date"] = pd.to_datetime(archive["date"]).dt.date
+    archive["media_type"] = archive["media_type"].astype("category")
+
+    # Every day up to covered_through is in the archive (or has no picture), so the query layer can trust it
+    table = pa.Table.from_pandas(archive, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    if covered_through is not None:
+        metadata[b"covered_through"] = covered_through.isoformat().encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # Write to a temp file first so readers never see a half-written archive
+    tmp_path = APOD_ARCHIVE_PATH + ".tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, APOD_ARCHIVE_PATH)
+    return len(archive)
+
+
+def apod_archive_coverage():
+    def read_coverage():
+        metadata = pq.read_schema(APOD_ARCHIVE_PATH).metadata or {}
+        if b"covered_through" not in metadata:
+            return None
+        return datetime.strptime(metadata[b"covered_through"].decode(), "%Y-%m-%d").date()
+
+    version = _path_version(APOD_ARCHIVE_PATH)
+    if version is None:
+        return None
+    return _cached_local(("apod_coverage",), version, read_coverage)
+
+
+def query_local_apod_days(first_day, last_day, exclude=()):
+    # Days the archive covers come back as pictures, or None for days without one
+    covered_through = apod_archive_coverage()
+    if covered_through is None or first_day > covered_through:
+        return {}
+    last_day = min(last_day, covered_through)
+    table = query_local_dataset(APOD_ARCHIVE_PATH, partitioning=None,
+                                filter=(ds.field("date") >= first_day) & (ds.field("date") <= last_day))
+    days = {first_day + timedelta(days=i): None for i in range((last_day - first_day).days + 1)}
+    for record in table.to_pylist():
+        record["date"] = record["date"].isoformat()
+        days[datetime.strptime(record["date"], "%Y-%m-%d").date()] = {
+            key: value for key, value in record.items() if value is not None}
+    return {day: item for day, item in days.items() if day not in exclude}
+
+
+def apod_archive_version():
+    try:
+        return os.path.getmtime(APOD_ARCHIVE_PATH)
+    except OSError:
+        return None
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_apod_archive(version):
+    if version is None:
+        return None
+    return pd.read_parquet(APOD_ARCHIVE_PATH)
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in SEARCH_STOPWORDS]
+
+
+@st.cache_resource(max_entries=1, show_spinner="Indexing APOD archive...")
+def build_apod_search_index(version):
+    archive = load_apod_archive(version)
+    if archive is None:
+        return None
+
+    postings = defaultdict(lambda: ([], []))
+    doc_lengths = np.zeros(len(archive), dtype=np.float32)
+    fields = [archive[field].fillna("").tolist() for field in APOD_SEARCH_FIELDS]
+    weights = list(APOD_SEARCH_FIELDS.values())
+    for doc_id, texts in enumerate(zip(*fields)):
+        counts = Counter()
+        for text, weight in zip(texts, weights):
+            for token in tokenize(text):
+                counts[token] += weight
+        doc_lengths[doc_id] = sum(counts.values())
+        for token, tf in counts.items():
+            doc_ids, tfs = postings[token]
+            doc_ids.append(doc_id)
+            tfs.append(tf)
+
+    return {
+        "postings": {token: (np.array(doc_ids, dtype=np.int32), np.array(tfs, dtype=np.float32))
+                     for token, (doc_ids, tfs) in postings.items()},
+        "doc_lengths": doc_lengths,
+        "avg_length": float(doc_lengths.mean()) if len(doc_lengths) else 0.0,
+    }
+
+
+def search_apod_archive(query, limit=20, k1=1.2, b=0.75):
+    # BM25 ranking over title/copyright/explanation
+    version = apod_archive_version()
+    index = build_apod_search_index(version)
+    if index is None:
+        return None
+    archive = load_apod_archive(version)
+
+    doc_lengths = index["doc_lengths"]
+    scores = np.zeros(len(doc_lengths), dtype=np.float32)
+    for token in set(tokenize(query)):
+        if token not in index["postings"]:
+            continue
+        doc_ids, tfs = index["postings"][token]
+        idf = np.log(1 + (len(doc_lengths) - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+        norm = k1 * (1 - b + b * doc_lengths[doc_ids] / index["avg_length"])
+        scores[doc_ids] += idf * tfs * (k1 + 1) / (tfs + norm)
+
+    matches = np.flatnonzero(scores)
+    if len(matches) > limit:
+        matches = matches[np.argpartition(scores[matches], -limit)[-limit:]]
+    matches = matches[np.argsort(-scores[matches])]
+    results = archive.iloc[matches].copy()
+    results["score"] = scores[matches]
+    return results
+
+
+def sample_apod_archive(count):
+    archive = load_apod_archive(apod_archive_version())
+    if archive is None or archive.empty:
+        return None
+    return archive.sample(min(count, len(archive)))
+
+
+def apod_records(frame):
+    # Back to the same shape the API returns (dates as strings, no empty fields)
+    records = []
+    for row in frame.to_dict("records"):
+        row["date"] = str(row["date"])
+        records.append({key: value for key, value in row.items() if isinstance(value, (str, float)) and
+                        not (isinstance(value, float) and np.isnan(value))})
+    return records
 
 
 def fetch_mars_rover_photos(api_key, rover, date_param, camera=None, page=1):
-    url = f"https://api.nasa.gov/mars-photos/api/v1/rovers/{rover}/photos"
+    url = MARS_PHOTOS_URL.format(rover.lower())
     params = {
         "api_key": api_key,
         "page": page
@@ -43,37 +675,483 @@ def fetch_mars_rover_photos(api_key, rover, date_param, camera=None, page=1):
     if camera and camera != "All":
         params["camera"] = camera.lower()
 
+    local = None
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        return response.json()
-    except requests.RequestException as e:
+        local = query_local_rover_photos(rover, date_param, camera, page)
+    except (pa.ArrowException, OSError):
+        pass  # An unreadable local dataset never hides the API
+    if local is not None:
+        return local
+
+    try:
+        return cached_get_json(url, params=params)
+    except (requests.RequestException, ValueError) as e:
         return {"error": {"message": f"Failed to fetch data: {str(e)}"}}
 
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def fetch_asteroid_data(api_key, start_date, end_date):
-    url = f"https://api.nasa.gov/neo/rest/v1/feed"
-    params = {
-        "start_date": start_date,
-        "end_date": end_date,
-        "api_key": api_key
+NEO_FEED_URL = "https://api.nasa.gov/neo/rest/v1/feed"
+NEO_FEED_WORKERS = 6
+NEO_FEED_PAST_TTL = 7 * 24 * 3600  # Windows entirely in the past barely change
+
+
+def neo_feed_windows(first_day, last_day):
+    # The feed only accepts 7 days at a time. Windows are aligned to Monday..Sunday so
+    # overlapping queries ask for exactly the same windows and hit the cache.
+    window_start = first_day - timedelta(days=first_day.weekday())
+    windows = []
+    while window_start <= last_day:
+        windows.append((window_start, window_start + timedelta(days=6)))
+        window_start += timedelta(days=7)
+    return windows
+
+
+NEO_DATASET_DIR = os.path.join(RESPONSE_CACHE_DIR, "neo_feed")
+
+
+def _is_past_neo_window(window_end):
+    return window_end < datetime.utcnow().date() - timedelta(days=1)
+
+
+def _fetch_neo_feed_window(api_key, window_start, window_end):
+    params = {"start_date": window_start.isoformat(), "end_date": window_end.isoformat(), "api_key": api_key}
+    ttl = NEO_FEED_PAST_TTL if _is_past_neo_window(window_end) else None
+    return cached_get_json(NEO_FEED_URL, params=params, ttl=ttl)
+
+
+def local_neo_windows():
+    version = _path_version(NEO_DATASET_DIR)
+    if version is None:
+        return set()
+    return _cached_local(("neo_windows",), version,
+                         lambda: {name.split("=", 1)[1] for name in os.listdir(NEO_DATASET_DIR)
+                                  if name.startswith("window=")})
+
+
+def _write_neo_window(window_start, feed):
+    # Past windows are final, so they go into the local dataset (one window=YYYY-MM-DD partition each)
+    partition = f"window={window_start.isoformat()}"
+    if os.path.exists(os.path.join(NEO_DATASET_DIR, partition)):
+        return
+    dates = sorted(feed.get("near_earth_objects", {}))
+    table = pa.table({
+        "date": pa.array([datetime.strptime(date, "%Y-%m-%d").date() for date in dates], type=pa.date32()),
+        "objects": pa.array([json.dumps(feed["near_earth_objects"][date]) for date in dates], type=pa.large_string()),
+    })
+    # Build the partition under a hidden name and rename it into place, so it appears all at once
+    tmp_dir = os.path.join(NEO_DATASET_DIR, f".{partition}.{os.getpid()}.{threading.get_ident()}")
+    os.makedirs(tmp_dir, exist_ok=True)
+    pq.write_table(table, os.path.join(tmp_dir, "part-0.parquet"), compression="zstd")
+    try:
+        os.rename(tmp_dir, os.path.join(NEO_DATASET_DIR, partition))
+    except OSError:
+        # Another process got there first
+        os.remove(os.path.join(tmp_dir, "part-0.parquet"))
+        os.rmdir(tmp_dir)
+
+
+def query_local_neo_feed(first_day, last_day):
+    table = query_local_dataset(NEO_DATASET_DIR, columns=["date", "objects"],
+                                filter=(ds.field("date") >= first_day) & (ds.field("date") <= last_day))
+    if table is None:
+        return {}
+    return {date.isoformat(): json.loads(objects)
+            for date, objects in zip(table.column("date").to_pylist(), table.column("objects").to_pylist())}
+
+
+@st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
+def _merged_neo_feed(start_date, end_date, _api_key):
+    first_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+    last_day = datetime.strptime(end_date, "%Y-%m-%d").date()
+    windows = neo_feed_windows(first_day, last_day)
+    # Windows already in the local dataset are read from disk; only the rest go to the API
+    local_windows = local_neo_windows()
+    remote_windows = [window for window in windows if window[0].isoformat() not in local_windows]
+    feeds = []
+    if remote_windows:
+        with ThreadPoolExecutor(max_workers=min(NEO_FEED_WORKERS, len(remote_windows))) as pool:
+            feeds = list(pool.map(lambda window: _fetch_neo_feed_window(_api_key, *window), remote_windows))
+        os.makedirs(NEO_DATASET_DIR, exist_ok=True)
+        for (window_start, window_end), feed in zip(remote_windows, feeds):
+            if _is_past_neo_window(window_end):
+                _write_neo_window(window_start, feed)
+
+    # Merge the windows, keeping only the days that were asked for
+    near_earth_objects = {}
+    if len(remote_windows) < len(windows):
+        near_earth_objects.update(query_local_neo_feed(first_day, last_day))
+    for feed in feeds:
+        for date, asteroids in feed.get("near_earth_objects", {}).items():
+            if start_date <= date <= end_date:
+                near_earth_objects[date] = asteroids
+    near_earth_objects = dict(sorted(near_earth_objects.items()))
+    return {
+        "element_count": sum(len(asteroids) for asteroids in near_earth_objects.values()),
+        "near_earth_objects": near_earth_objects,
     }
-    response = requests.get(url, params=params)
-    return response.json()
+
+
+def fetch_asteroid_data(api_key, start_date, end_date):
+    try:
+        return _merged_neo_feed(start_date, end_date, api_key)
+    except (requests.RequestException, ValueError) as e:
+        return {"error": {"message": f"Failed to fetch data: {str(e)}"}}
+
+
+NEO_FRAME_COLUMNS = ["id", "name", "feed_date", "hazardous", "absolute_magnitude", "diameter_min_m",
+                     "diameter_max_m", "approach_index", "approach_date", "miss_distance_km",
+                     "relative_velocity_kps", "orbiting_body", "nasa_jpl_url"]
+
+
+def flatten_neo_feed(feed):
+    # One row per close approach, with every numeric field parsed to a float once
+    rows = {column: [] for column in NEO_FRAME_COLUMNS}
+    for feed_date, asteroids in feed["near_earth_objects"].items():
+        for asteroid in asteroids:
+            diameter = asteroid["estimated_diameter"]["meters"]
+            for approach_index, approach in enumerate(asteroid["close_approach_data"]):
+                rows["id"].append(asteroid["id"])
+                rows["name"].append(asteroid["name"])
+                rows["feed_date"].append(feed_date)
+                rows["hazardous"].append(asteroid["is_potentially_hazardous_asteroid"])
+                rows["absolute_magnitude"].append(asteroid.get("absolute_magnitude_h"))
+                rows["diameter_min_m"].append(diameter["estimated_diameter_min"])
+                rows["diameter_max_m"].append(diameter["estimated_diameter_max"])
+                rows["approach_index"].append(approach_index)
+                rows["approach_date"].append(approach["close_approach_date"])
+                rows["miss_distance_km"].append(approach["miss_distance"]["kilometers"])
+                rows["relative_velocity_kps"].append(approach["relative_velocity"]["kilometers_per_second"])
+                rows["orbiting_body"].append(approach.get("orbiting_body"))
+                rows["nasa_jpl_url"].append(asteroid.get("nasa_jpl_url"))
+
+    frame = pd.DataFrame(rows)
+    frame["feed_date"] = pd.to_datetime(frame["feed_date"])
+    frame["approach_date"] = pd.to_datetime(frame["approach_date"])
+    frame["hazardous"] = frame["hazardous"].astype(bool)
+    frame["approach_index"] = frame["approach_index"].astype(np.int16)
+    for column in ["absolute_magnitude", "diameter_min_m", "diameter_max_m", "miss_distance_km",
+                   "relative_velocity_kps"]:
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").astype(np.float64)
+    frame["orbiting_body"] = frame["orbiting_body"].astype("category")
+    return frame
+
+
+@st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
+def _neo_frame(start_date, end_date, _api_key):
+    frame = flatten_neo_feed(_merged_neo_feed(start_date, end_date, _api_key))
+    # Each object's own listing in the feed (its first close approach), and name -> row in that listing
+    listings = frame[frame["approach_index"] == 0].drop_duplicates("name").reset_index(drop=True)
+    name_index = {name: row for row, name in enumerate(listings["name"])}
+    return frame, listings, name_index
+
+
+def fetch_asteroid_frame(api_key, start_date, end_date):
+    try:
+        return _neo_frame(start_date, end_date, api_key)
+    except (requests.RequestException, ValueError, KeyError) as e:
+        return {"error": {"message": f"Failed to fetch data: {str(e)}"}}, None, None
+
+
+def top_k(frame, column, k, largest=False):
+    # Partial selection: O(n) argpartition, then only the k winners get sorted
+    values = frame[column].to_numpy(dtype=np.float64)
+    if not largest:
+        values = -values
+    values = np.where(np.isnan(values), -np.inf, values)  # Missing values never win
+    k = min(k, len(values))
+    if k == 0:
+        return frame.iloc[[]]
+    best = np.argpartition(values, len(values) - k)[len(values) - k:]
+    best = best[np.argsort(-values[best], kind="stable")]
+    return frame.iloc[best]
+
+
+# Chart builders: points are downsampled server-side so figure payloads stay bounded
+CHART_WEBGL_THRESHOLD = 1000
+CHART_MAX_POINTS = 2000
+
+
+def scatter_render_mode(points):
+    return "webgl" if points > CHART_WEBGL_THRESHOLD else "auto"
+
+
+def ranked_sample(frame, column, max_points=CHART_MAX_POINTS, largest_first=True):
+    # Ranks every row by column, then keeps evenly spaced ranks (always both ends) for display
+    values = frame[column].to_numpy(dtype=np.float64)
+    order = np.argsort(-values if largest_first else values, kind="stable")  # NaN sorts last
+    keep = np.arange(len(order))
+    if len(order) > max_points:
+        keep = np.unique(np.linspace(0, len(order) - 1, max_points).round().astype(np.int64))
+    sample = frame.iloc[order[keep]].copy()
+    sample["rank"] = keep + 1
+    return sample
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _neo_size_points(start_date, end_date, _api_key):
+    _, listings, _ = _neo_frame(start_date, end_date, _api_key)
+    return ranked_sample(listings[["name", "diameter_max_m", "hazardous"]], "diameter_max_m"), len(listings)
+
+
+def asteroid_size_points(api_key, start_date, end_date):
+    # (sample ranked by max diameter, total number of asteroids), cached alongside the NEO frame
+    return _neo_size_points(start_date, end_date, api_key)
+
+
+# Close-approach analytics (everything below works on whole columns at once)
+DISTANCE_UNITS = {"km": 1.0, "lunar distances": 384400.0, "AU": 149597870.7, "miles": 1.609344}
+VELOCITY_UNITS = {"km/s": 1.0, "km/h": 1 / 3600, "mph": 1.609344 / 3600}
+
+
+def convert_distance(km, unit):
+    return np.asarray(km, dtype=np.float64) / DISTANCE_UNITS[unit]
+
+
+def convert_velocity(kps, unit):
+    return np.asarray(kps, dtype=np.float64) / VELOCITY_UNITS[unit]
+
+
+def approach_percentiles(frame, percentiles=(1, 5, 25, 50, 75, 95, 99), distance_unit="km", velocity_unit="km/s"):
+    values = np.column_stack([convert_distance(frame["miss_distance_km"], distance_unit),
+                              convert_velocity(frame["relative_velocity_kps"], velocity_unit)])
+    if len(values) == 0:
+        values = np.full((1, 2), np.nan)
+    result = np.nanpercentile(values, percentiles, axis=0)
+    return pd.DataFrame(result, index=pd.Index([f"p{p}" for p in percentiles], name="percentile"),
+                        columns=[f"miss distance ({distance_unit})", f"relative velocity ({velocity_unit})"])
+
+
+def daily_hazard_rates(frame):
+    days, day_codes = np.unique(frame["approach_date"].to_numpy(), return_inverse=True)
+    approaches = np.bincount(day_codes, minlength=len(days))
+    hazardous = np.bincount(day_codes, weights=frame["hazardous"].to_numpy(dtype=np.float64), minlength=len(days))
+    return pd.DataFrame({"date": days, "approaches": approaches, "hazardous": hazardous.astype(np.int64),
+                         "hazard_rate": hazardous / np.maximum(approaches, 1)})
+
+
+def nearest_approaches(frame, k=10):
+    return top_k(frame, "miss_distance_km", k)
+
+
+def fastest_approaches(frame, k=10):
+    return top_k(frame, "relative_velocity_kps", k, largest=True)
+
+
+NEO_LOOKUP_URL = "https://api.nasa.gov/neo/rest/v1/neo/{}"
+NEO_LOOKUP_WORKERS = 8
+NEO_ORBIT_COLUMNS = ["semi_major_axis", "eccentricity", "inclination", "orbital_period", "perihelion_distance",
+                     "aphelion_distance", "minimum_orbit_intersection", "mean_motion"]
+
+
+def fetch_neo_details(api_key, neo_ids, max_workers=NEO_LOOKUP_WORKERS):
+    # Each id is fetched once however often it appears, and results live in the response cache for a month
+    unique_ids = list(dict.fromkeys(str(neo_id) for neo_id in neo_ids))
+    details, failed = {}, []
+    if not unique_ids:
+        return details, failed
+
+    def lookup(neo_id):
+        return cached_get_json(NEO_LOOKUP_URL.format(neo_id), params={"api_key": api_key})
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_ids))) as pool:
+        futures = {pool.submit(lookup, neo_id): neo_id for neo_id in unique_ids}
+        for future in as_completed(futures):
+            try:
+                details[futures[future]] = future.result()
+            except (requests.RequestException, ValueError):
+                failed.append(futures[future])
+    return details, failed
+
+
+def neo_orbit_frame(details):
+    rows = []
+    for neo_id, detail in details.items():
+        orbit = detail.get("orbital_data", {})
+        row = {"id": neo_id, "name": detail.get("name"),
+               "orbit_class": orbit.get("orbit_class", {}).get("orbit_class_type"),
+               "first_observation": orbit.get("first_observation_date"),
+               "last_observation": orbit.get("last_observation_date")}
+        row.update({column: orbit.get(column) for column in NEO_ORBIT_COLUMNS})
+        rows.append(row)
+
+    frame = pd.DataFrame(rows, columns=["id", "name", "orbit_class", "first_observation", "last_observation"] +
+                         NEO_ORBIT_COLUMNS)
+    for column in NEO_ORBIT_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column], errors="coerce")
+    return frame
+
+
+EPIC_ARCHIVE_URL = "https://epic.gsfc.nasa.gov/archive/natural"
+EPIC_FINAL_AFTER = timedelta(days=3)  # Older days are fully published and never change
+EPIC_PAST_TTL = 365 * 24 * 3600
+EPIC_WORKERS = 6
+EPIC_MAX_DAYS = 31
+EPIC_TIMELAPSE_MAX_FRAMES = 120
+EPIC_TIMELAPSE_FRAME_SIZE = 384
 
 
 def fetch_epic_data(api_key, date):
     url = f"https://api.nasa.gov/EPIC/api/natural/date/{date}?api_key={api_key}"
-    response = requests.get(url)
-    return response.json()
+    final = datetime.strptime(date, "%Y-%m-%d") < datetime.utcnow() - EPIC_FINAL_AFTER
+    try:
+        return cached_get_json(url, ttl=EPIC_PAST_TTL if final else None)
+    except (requests.RequestException, ValueError) as e:
+        return {"error": {"message": f"Failed to fetch data: {str(e)}"}}
+
+
+def fetch_epic_range(api_key, start_date, end_date):
+    # Every day's metadata at once, each cached on its own; returns (images in time order, failed days)
+    start, end = datetime.strptime(start_date, "%Y-%m-%d"), datetime.strptime(end_date, "%Y-%m-%d")
+    days = [(start + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range((end - start).days + 1)]
+    with ThreadPoolExecutor(max_workers=min(EPIC_WORKERS, len(days))) as pool:
+        results = list(pool.map(lambda day: fetch_epic_data(api_key, day), days))
+    images = [image for result in results if isinstance(result, list) for image in result]
+    failed = [day for day, result in zip(days, results) if not isinstance(result, list)]
+    return sorted(images, key=lambda image: image["date"]), failed
+
+
+def epic_image_url(image, variant="png"):
+    # The archive keeps every frame as png (2048px), jpg (1024px) and thumbs (small jpg)
+    extension = "png" if variant == "png" else "jpg"
+    return f"{EPIC_ARCHIVE_URL}/{image['date'][:10].replace('-', '/')}/{variant}/{image['image']}.{extension}"
+
+
+def build_epic_timelapse(images, image_format="GIF", frame_duration=200, max_frames=EPIC_TIMELAPSE_MAX_FRAMES):
+    # Evenly spaced frames across the whole sequence, reduced and cached by fetch_thumbnails
+    if len(images) > max_frames:
+        images = [images[i] for i in np.linspace(0, len(images) - 1, max_frames).round().astype(int)]
+    urls = [epic_image_url(image, "jpg") for image in images]
+    thumbnails = fetch_thumbnails(urls, EPIC_TIMELAPSE_FRAME_SIZE)
+    frames = [thumbnails[url] for url in urls if thumbnails.get(url)]
+    if not frames:
+        return None
+    return build_animation(frames, image_format, frame_duration)
+
+
+EONET_URL = "https://eonet.gsfc.nasa.gov/api/v3/events"
+EONET_SEED_DAYS = 365
+EONET_SYNC_INTERVAL = timedelta(minutes=15)
+EONET_SYNC_OVERLAP = timedelta(days=2)  # Re-read a little before the watermark to catch late updates
+# Events can close without a new geometry, which an incremental window never sees, so the whole
+# seed window is re-read this often to keep the stored closed dates right
+EONET_FULL_SYNC_INTERVAL = timedelta(days=1)
+
+
+def _merge_eonet_event(existing, incoming):
+    # Newest metadata wins; geometries from both are kept, de-duplicated and in date order
+    merged = dict(incoming)
+    geometries = {}
+    for geometry in (existing or {}).get("geometry", []) + incoming.get("geometry", []):
+        geometries[(geometry["date"], geometry["type"], json.dumps(geometry["coordinates"]))] = geometry
+    merged["geometry"] = sorted(geometries.values(), key=lambda geometry: geometry["date"])
+    return merged
+
+
+def eonet_store_state():
+    return dict(_cache_db().execute("SELECT name, value FROM eonet_sync").fetchall())
+
+
+_eonet_sync_lock = threading.Lock()
+
+
+def _claim_eonet_sync(now, force=False):
+    # Recorded before the network call so concurrent sessions and processes don't all run the same
+    # sync; an attempt that fails waits out the interval just like one that finished
+    conn = _cache_db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        state = dict(conn.execute("SELECT name, value FROM eonet_sync").fetchall())
+        last = max(state.get("synced_at", ""), state.get("sync_started_at", ""))
+        if not force and last and now - datetime.fromisoformat(last) < EONET_SYNC_INTERVAL:
+            state = None
+        else:
+            conn.execute("INSERT OR REPLACE INTO eonet_sync VALUES ('sync_started_at', ?)", (now.isoformat(),))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return state
+
+
+def sync_eonet_store(force=False):
+    # The first sync seeds a year of events; after that only events since the last watermark are
+    # fetched, except for a daily full pass over the seed window
+    if not _eonet_sync_lock.acquire(blocking=False):
+        return 0  # Another thread in this process is already syncing
+    try:
+        now = datetime.utcnow()
+        state = _claim_eonet_sync(now, force)
+        if state is None:
+            return 0
+
+        full = ("watermark" not in state or "full_synced_at" not in state
+                or now - datetime.fromisoformat(state["full_synced_at"]) >= EONET_FULL_SYNC_INTERVAL)
+        if full:
+            start = now - timedelta(days=EONET_SEED_DAYS)
+        else:
+            start = datetime.fromisoformat(state["watermark"]) - EONET_SYNC_OVERLAP
+        params = {"start": start.strftime("%Y-%m-%d"), "end": now.strftime("%Y-%m-%d"), "status": "all"}
+        response = http_get(EONET_URL, params=params)
+        response.raise_for_status()
+        events = response.json()["events"]
+
+        conn = _cache_db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for event in events:
+                row = conn.execute("SELECT body FROM eonet_events WHERE id = ?", (event["id"],)).fetchone()
+                merged = _merge_eonet_event(json.loads(zlib.decompress(row[0])) if row else None, event)
+                dates = [geometry["date"] for geometry in merged["geometry"]] or [now.isoformat()]
+                conn.execute("INSERT OR REPLACE INTO eonet_events VALUES (?, ?, ?, ?, ?)",
+                             (merged["id"], zlib.compress(json.dumps(merged).encode()), min(dates), max(dates),
+                              merged.get("closed")))
+            if "seeded_from" not in state:
+                conn.execute("INSERT OR REPLACE INTO eonet_sync VALUES ('seeded_from', ?)", (params["start"],))
+            conn.execute("INSERT OR REPLACE INTO eonet_sync VALUES ('watermark', ?)", (now.isoformat(),))
+            conn.execute("INSERT OR REPLACE INTO eonet_sync VALUES ('synced_at', ?)", (now.isoformat(),))
+            if full:
+                conn.execute("INSERT OR REPLACE INTO eonet_sync VALUES ('full_synced_at', ?)", (now.isoformat(),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(events)
+    finally:
+        _eonet_sync_lock.release()
+
+
+def query_eonet_store(limit=1000, days=365, status="all"):
+    # Same shape as the API response, or None if the store doesn't reach back far enough
+    state = eonet_store_state()
+    since = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+    if "seeded_from" not in state or state["seeded_from"] > since:
+        return None
+
+    sql = "SELECT body FROM eonet_events WHERE last_date >= ?"
+    if status == "open":
+        sql += " AND closed IS NULL"
+    elif status == "closed":
+        sql += " AND closed IS NOT NULL"
+    sql += " ORDER BY last_date DESC LIMIT ?"
+    events = []
+    for (body,) in _cache_db().execute(sql, (since, limit)).fetchall():
+        event = json.loads(zlib.decompress(body))
+        event["geometry"] = [geometry for geometry in event["geometry"] if geometry["date"] >= since]
+        events.append(event)
+    return {"title": "EONET Events", "events": events}
 
 
 def fetch_eonet_events(limit=1000, days=365, status="all"):
+    # Served from the local event store, which is brought up to date at most every 15 minutes
+    try:
+        sync_eonet_store()
+    except (requests.RequestException, ValueError, KeyError, sqlite3.OperationalError):
+        pass  # Fall back to whatever the store already has (a lock timeout included)
+    local = query_eonet_store(limit, days, status)
+    if local is not None:
+        return local
+
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
-
-    url = "https://eonet.gsfc.nasa.gov/api/v3/events"
     params = {
         "limit": limit,
         "start": start_date.strftime("%Y-%m-%d"),
@@ -82,107 +1160,964 @@ def fetch_eonet_events(limit=1000, days=365, status="all"):
     }
 
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
+        return cached_get_json(EONET_URL, params=params)
+    except (requests.RequestException, ValueError) as e:
         st.error(f"Error fetching EONET data: {e}")
         return None
 
 
-def process_eonet_data(eonet_data):
-    events = []
+EONET_FRAME_CACHE_SIZE = 8
+_eonet_frames = OrderedDict()
+_eonet_frames_lock = threading.Lock()
+
+
+def flatten_eonet_events(eonet_data):
+    # One row per geometry. Points keep their coordinates; polygons are reduced to their centroid
+    # and keep their bounding box instead of being dropped.
+    ids, titles, categories, sources, dates, geometry_types = [], [], [], [], [], []
+    point_rows, points, polygon_rows, rings = [], [], [], []
     for event in eonet_data["events"]:
         category = event["categories"][0]["title"] if event["categories"] else "Uncategorized"
-
+        source = (event.get("sources") or [{}])[0].get("url", "N/A")
         for geometry in event["geometry"]:
+            row = len(ids)
             if geometry["type"] == "Point":
-                lat, lon = geometry["coordinates"][1], geometry["coordinates"][0]
-                events.append({
-                    "id": event["id"],
-                    "title": event["title"],
-                    "category": category,
-                    "date": geometry["date"],
-                    "lat": lat,
-                    "lon": lon,
-                    "source": event.get("sources", [{}])[0].get("url", "N/A")
-                })
+                point_rows.append(row)
+                points.append(geometry["coordinates"][:2])
+            elif geometry["type"] == "Polygon" and geometry["coordinates"] and geometry["coordinates"][0]:
+                ring = geometry["coordinates"][0]  # Outer ring
+                if len(ring) > 1 and ring[0][:2] == ring[-1][:2]:
+                    ring = ring[:-1]  # GeoJSON repeats the first vertex to close the ring
+                polygon_rows.append(row)
+                rings.append(ring)
+            else:
+                continue
+            ids.append(event["id"])
+            titles.append(event["title"])
+            categories.append(category)
+            sources.append(source)
+            dates.append(geometry["date"])
+            geometry_types.append(geometry["type"])
+
+    count = len(ids)
+    lon = np.full(count, np.nan, dtype=np.float32)
+    lat = np.full(count, np.nan, dtype=np.float32)
+    bbox = np.full((count, 4), np.nan, dtype=np.float32)  # min_lon, min_lat, max_lon, max_lat
+    if points:
+        points = np.asarray(points, dtype=np.float32)
+        lon[point_rows], lat[point_rows] = points[:, 0], points[:, 1]
+        bbox[point_rows] = np.column_stack([points, points])
+    if rings:
+        # All polygon vertices in one array; reduceat works out every polygon's centroid and bbox at once
+        vertices = np.concatenate([np.asarray(ring, dtype=np.float32)[:, :2] for ring in rings])
+        starts = np.cumsum([0] + [len(ring) for ring in rings[:-1]])
+        sizes = np.array([len(ring) for ring in rings], dtype=np.float32)
+        lon[polygon_rows] = np.add.reduceat(vertices[:, 0], starts) / sizes
+        lat[polygon_rows] = np.add.reduceat(vertices[:, 1], starts) / sizes
+        bbox[polygon_rows] = np.column_stack([np.minimum.reduceat(vertices[:, 0], starts),
+                                              np.minimum.reduceat(vertices[:, 1], starts),
+                                              np.maximum.reduceat(vertices[:, 0], starts),
+                                              np.maximum.reduceat(vertices[:, 1], starts)])
+
+    return pd.DataFrame({
+        "id": ids,
+        "title": titles,
+        "category": pd.Categorical(categories),
+        "date": pd.to_datetime(pd.Series(dates, dtype=object), utc=True),
+        "lat": lat,
+        "lon": lon,
+        "geometry_type": pd.Categorical(geometry_types, categories=["Point", "Polygon"]),
+        "min_lon": bbox[:, 0],
+        "min_lat": bbox[:, 1],
+        "max_lon": bbox[:, 2],
+        "max_lat": bbox[:, 3],
+        "source": sources,
+    })
+
+
+def process_eonet_data(eonet_data):
+    # Cached on the payload object itself: the page keeps the same dict in session state
+    # across reruns, so it is only flattened once. Treat the returned frame as read-only.
+    key = id(eonet_data)
+    with _eonet_frames_lock:
+        entry = _eonet_frames.get(key)
+        if entry is not None and entry[0] is eonet_data:
+            _eonet_frames.move_to_end(key)
+            return entry[1]
+    frame = flatten_eonet_events(eonet_data)
+    with _eonet_frames_lock:
+        # Holding a reference to the payload keeps its id from being reused while cached
+        _eonet_frames[key] = (eonet_data, frame)
+        while len(_eonet_frames) > EONET_FRAME_CACHE_SIZE:
+            _eonet_frames.popitem(last=False)
+    return frame
+
+
+_frame_aggregates = OrderedDict()
+_frame_aggregates_lock = threading.Lock()
+
 
-    return pd.DataFrame(events)
+def _frame_aggregate(frame, name, build):
+    # Aggregations cached on the frame object, next to the frame itself in process_eonet_data
+    key = (id(frame), name)
+    with _frame_aggregates_lock:
+        entry = _frame_aggregates.get(key)
+        if entry is not None and entry[0] is frame:
+            _frame_aggregates.move_to_end(key)
+            return entry[1]
+    result = build(frame)
+    with _frame_aggregates_lock:
+        _frame_aggregates[key] = (frame, result)
+        while len(_frame_aggregates) > EONET_FRAME_CACHE_SIZE * 4:
+            _frame_aggregates.popitem(last=False)
+    return result
+
+
+def _category_counts(frame):
+    return frame["category"].value_counts().rename_axis("category").reset_index(name="count")
+
+
+def _daily_category_counts(frame):
+    counts = frame.groupby([frame["date"].dt.floor("D"), frame["category"]], observed=True).size()
+    return counts.rename("count").reset_index()
+
+
+def eonet_category_counts(frame):
+    return _frame_aggregate(frame, "category_counts", _category_counts)
+
+
+def eonet_daily_counts(frame):
+    # Events per category per day: at most days x categories rows, however many events there are
+    return _frame_aggregate(frame, "daily_counts", _daily_category_counts)
+
+
+EONET_INDEX_CELL_DEGREES = 2.0
+EARTH_RADIUS_KM = 6371.0088
+
+
+def build_spatial_index(lat, lon, cell=EONET_INDEX_CELL_DEGREES):
+    # Uniform lat/lon grid: row positions sorted by cell, with each occupied cell's slice into them
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    rows = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+    columns = int(np.ceil(360.0 / cell))
+    grid_rows = int(np.ceil(180.0 / cell))
+    cell_rows = np.clip(np.floor((lat[rows] + 90) / cell), 0, grid_rows - 1).astype(np.int64)
+    cell_columns = np.floor((lon[rows] + 180) / cell).astype(np.int64) % columns
+    cells = cell_rows * columns + cell_columns
+    order = np.argsort(cells, kind="stable")
+    keys, starts = np.unique(cells[order], return_index=True)
+    return {"cell": cell, "columns": columns, "grid_rows": grid_rows, "rows": rows[order], "keys": keys,
+            "starts": starts, "ends": np.append(starts[1:], len(order))}
+
+
+def _frame_spatial_index(frame):
+    return build_spatial_index(frame["lat"].to_numpy(), frame["lon"].to_numpy())
+
+
+def eonet_spatial_index(frame):
+    # Cached on the frame object like the chart aggregations; masks are positional over that frame
+    return _frame_aggregate(frame, "spatial_index", _frame_spatial_index)
+
+
+def _index_candidates(index, south, west, north, east):
+    # Rows in the grid cells overlapping the box; west > east means it crosses the antimeridian
+    cell, columns = index["cell"], index["columns"]
+    if south <= -90 and north >= 90 and east - west >= 360:
+        return index["rows"]
+    first_row = int(np.clip(np.floor((max(south, -90) + 90) / cell), 0, index["grid_rows"] - 1))
+    last_row = int(np.clip(np.floor((min(north, 90) + 90) / cell), 0, index["grid_rows"] - 1))
+    if east - west >= 360:
+        cell_columns = np.arange(columns)
+    else:
+        first = int(np.floor(((west + 180) % 360) / cell)) % columns
+        last = int(np.floor(((east + 180) % 360) / cell)) % columns
+        cell_columns = np.arange(first, last + 1) if first <= last else \
+            np.concatenate([np.arange(first, columns), np.arange(0, last + 1)])
+    wanted = (np.arange(first_row, last_row + 1)[:, None] * columns + cell_columns[None, :]).ravel()
+    positions = np.searchsorted(index["keys"], wanted)
+    found = positions < len(index["keys"])
+    positions = positions[found][index["keys"][positions[found]] == wanted[found]]
+    if not len(positions):
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate([index["rows"][start:end]
+                           for start, end in zip(index["starts"][positions], index["ends"][positions])])
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def eonet_bbox_mask(frame, bounds):
+    # bounds is (south, west, north, east) as reported by the map; None means the whole world
+    mask = np.zeros(len(frame), dtype=bool)
+    if bounds is None:
+        mask[eonet_spatial_index(frame)["rows"]] = True
+        return mask
+    south, west, north, east = bounds
+    if east - west < 360:
+        west, east = (west + 180) % 360 - 180, (east + 180) % 360 - 180
+    candidates = _index_candidates(eonet_spatial_index(frame), south, west, north, east)
+    lat = frame["lat"].to_numpy()[candidates]
+    lon = frame["lon"].to_numpy()[candidates]
+    inside = (lat >= south) & (lat <= north)
+    if east - west < 360:
+        inside &= ((lon >= west) & (lon <= east)) if west <= east else ((lon >= west) | (lon <= east))
+    mask[candidates[inside]] = True
+    return mask
+
+
+def eonet_radius_mask(frame, lat, lon, radius_km):
+    # Grid lookup over the radius' bounding box, then exact great-circle distances for the candidates
+    angle = radius_km / EARTH_RADIUS_KM
+    south, north = lat - np.degrees(angle), lat + np.degrees(angle)
+    if south <= -90 or north >= 90 or np.sin(angle) >= np.cos(np.radians(lat)):
+        west, east = -180.0, 180.0
+    else:
+        spread = np.degrees(np.arcsin(np.sin(angle) / np.cos(np.radians(lat))))
+        west, east = (lon - spread + 180) % 360 - 180, (lon + spread + 180) % 360 - 180
+    candidates = _index_candidates(eonet_spatial_index(frame), south, west, north, east)
+    distances = haversine_km(frame["lat"].to_numpy()[candidates], frame["lon"].to_numpy()[candidates], lat, lon)
+    mask = np.zeros(len(frame), dtype=bool)
+    mask[candidates[distances <= radius_km]] = True
+    return mask
+
+
+EONET_MAP_CLUSTER_THRESHOLD = int(os.environ.get("NASA_EONET_CLUSTER_THRESHOLD", 500))
+EONET_MAP_CELLS_PER_TILE = 4  # Cluster grid: a 256px map tile is split into 4x4 cells at the current zoom
+EONET_CATEGORY_COLORS = ["#e6194b", "#3cb44b", "#4363d8", "#f58231", "#911eb4", "#42d4f4", "#f032e6",
+                         "#bfef45", "#469990", "#9a6324", "#800000", "#808000", "#000075"]
+
+
+def cluster_eonet_points(frame, zoom):
+    # Server-side pre-clustering on a lon/lat grid whose cells halve with every zoom level
+    cell = 360.0 / (2 ** zoom) / EONET_MAP_CELLS_PER_TILE
+    lat = frame["lat"].to_numpy(dtype=np.float64)
+    lon = frame["lon"].to_numpy(dtype=np.float64)
+    columns = int(np.ceil(360.0 / cell)) + 1
+    cells = np.floor((lat + 90) / cell).astype(np.int64) * columns + np.floor((lon + 180) / cell).astype(np.int64)
+    _, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+    codes = frame["category"].cat.codes.to_numpy()
+    categories = len(frame["category"].cat.categories)
+    per_category = np.bincount(inverse * categories + codes, minlength=len(counts) * categories)
+    return pd.DataFrame({
+        "lat": np.bincount(inverse, weights=lat) / counts,
+        "lon": np.bincount(inverse, weights=lon) / counts,
+        "count": counts,
+        "category": pd.Categorical.from_codes(per_category.reshape(-1, categories).argmax(axis=1),
+                                              frame["category"].cat.categories),
+    })
+
+
+def eonet_map_layer(frame, zoom=2, bounds=None, mask=None):
+    # One GeoJSON layer built from column arrays: individual events while the view holds few of them,
+    # grid clusters once it passes EONET_MAP_CLUSTER_THRESHOLD
+    in_view = eonet_bbox_mask(frame, bounds)
+    frame = frame[in_view if mask is None else in_view & mask]
+    categories = frame["category"].cat.categories
+    palette = {category: EONET_CATEGORY_COLORS[i % len(EONET_CATEGORY_COLORS)] for i, category in enumerate(categories)}
+
+    if len(frame) > EONET_MAP_CLUSTER_THRESHOLD:
+        clusters = cluster_eonet_points(frame, zoom)
+        radii = np.round(4 + 3 * np.log2(clusters["count"].to_numpy()), 1)
+        features = [
+            {"type": "Feature", "geometry": {"type": "Point", "coordinates": [x, y]},
+             "properties": {"label": f"{n} events (mostly {category})" if n > 1 else f"1 event ({category})",
+                            "color": palette[category], "radius": r}}
+            for x, y, n, category, r in zip(clusters["lon"].round(4).tolist(), clusters["lat"].round(4).tolist(),
+                                            clusters["count"].tolist(), clusters["category"].tolist(),
+                                            radii.tolist())
+        ]
+        popup = None
+    else:
+        features = [
+            {"type": "Feature", "geometry": {"type": "Point", "coordinates": [x, y]},
+             "properties": {"label": f"{category}: {title}", "color": palette[category], "radius": 6,
+                            "popup": f"<b>{title}</b><br>Date: {date}<br>"
+                                     f"<a href='{source}' target='_blank'>More Info</a>"}}
+            for x, y, title, category, date, source in zip(
+                frame["lon"].round(4).tolist(), frame["lat"].round(4).tolist(), frame["title"].tolist(),
+                frame["category"].tolist(), frame["date"].dt.strftime("%Y-%m-%d %H:%M").tolist(),
+                frame["source"].tolist())
+        ]
+        popup = folium.GeoJsonPopup(fields=["popup"], labels=False)
+
+    layer = folium.FeatureGroup(name="Events")
+    if features:
+        folium.GeoJson(
+            {"type": "FeatureCollection", "features": features},
+            marker=folium.CircleMarker(fill=True, fill_opacity=0.7, weight=1),
+            style_function=lambda feature: {"color": feature["properties"]["color"],
+                                            "fillColor": feature["properties"]["color"],
+                                            "radius": feature["properties"]["radius"]},
+            tooltip=folium.GeoJsonTooltip(fields=["label"], labels=False),
+            popup=popup,
+        ).add_to(layer)
+    return layer, len(frame)
+
+
+def eonet_map_view(key="eonet_map"):
+    # Zoom and (south, west, north, east) bounds last reported by the map, if it has been drawn
+    view = st.session_state.get(key) or {}
+    bounds = None
+    if view.get("bounds") and view["bounds"].get("_southWest"):
+        south_west, north_east = view["bounds"]["_southWest"], view["bounds"]["_northEast"]
+        bounds = (south_west["lat"], south_west["lng"], north_east["lat"], north_east["lng"])
+    return view.get("zoom") or 2, bounds
+
+
+def display_eonet_map(frame, mask=None, key="eonet_map", height=500):
+    # The base map never changes, so panning and zooming only swap the event layer instead of re-rendering
+    zoom, bounds = eonet_map_view(key)
+    layer, in_view = eonet_map_layer(frame, zoom, bounds, mask)
+    base = folium.Map(location=[0, 0], zoom_start=2)
+    st_folium(base, key=key, width=None, height=height, feature_group_to_add=layer,
+              returned_objects=["zoom", "bounds"])
+    return in_view
 
 
 def fetch_earth_data_search(query, limit=10):
     url = f"https://cmr.earthdata.nasa.gov/search/collections.json?keyword={query}&page_size={limit}"
-    response = requests.get(url)
+    response = http_get(url)
     return response.json()
 
 
-def fetch_earth_imagery(api_key, lat, lon, date, dim=0.15):
-    url = f"https://api.nasa.gov/planetary/earth/imagery"
-    params = {
-        "lon": lon,
-        "lat": lat,
-        "date": date,
-        "dim": dim,
-        "api_key": api_key
-    }
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        image = Image.open(BytesIO(response.content))
-        return image, params
-    except requests.RequestException as e:
-        return {"error": f"Failed to fetch image: {str(e)}"}, None
-    except IOError as e:
-        return {"error": f"Failed to process image: {str(e)}"}, None
+EARTH_IMAGERY_URL = "https://api.nasa.gov/planetary/earth/imagery"
+EARTH_IMAGERY_CACHE_MAX_BYTES = int(os.environ.get("NASA_IMAGERY_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+EARTH_IMAGERY_MAX_BYTES = int(os.environ.get("NASA_IMAGERY_MAX_BYTES", 32 * 1024 * 1024))
+EARTH_IMAGERY_DOWNLOAD_TIMEOUT = 120  # Seconds for the whole body, on top of the per-read timeout
+EARTH_DISPLAY_SIZE = 1024
+
+
+def earth_imagery_key(lat, lon, date, dim):
+    return f"{float(lat):.5f}|{float(lon):.5f}|{date}|{float(dim):.4f}"
+
+
+def read_capped(response, max_bytes, timeout=None):
+    # Reads a streamed response in chunks, giving up once it passes max_bytes or the overall timeout
+    declared = response.headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise IOError(f"Response is {int(declared)} bytes; the limit is {max_bytes}")
+    deadline = time.monotonic() + timeout if timeout else None
+    chunks, total = [], 0
+    for chunk in response.iter_content(chunk_size=256 * 1024):
+        total += len(chunk)
+        if total > max_bytes:
+            raise IOError(f"Response is over the {max_bytes} byte limit")
+        if deadline is not None and time.monotonic() > deadline:
+            raise requests.Timeout(f"Download took longer than {timeout} seconds")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def fetch_earth_imagery_bytes(api_key, lat, lon, date, dim=0.15, budget=None):
+    # (encoded bytes, content type) exactly as served, shared by every session; raises on errors.
+    # A RateBudget, if given, is only charged for actual downloads.
+    key = earth_imagery_key(lat, lon, date, dim)
+    conn = _cache_db()
+    row = conn.execute("SELECT body, content_type FROM imagery WHERE key = ?", (key,)).fetchone()
+    if row is not None:
+        conn.execute("UPDATE imagery SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return row[0], row[1]
+
+    if budget is not None:
+        budget.wait()
+    params = {"lon": lon, "lat": lat, "date": date, "dim": dim, "api_key": api_key}
+    with http_get(EARTH_IMAGERY_URL, params=params, stream=True) as response:
+        response.raise_for_status()
+        content = read_capped(response, EARTH_IMAGERY_MAX_BYTES, EARTH_IMAGERY_DOWNLOAD_TIMEOUT)
+        content_type = response.headers.get("Content-Type", "image/png").split(";")[0]
+    Image.open(BytesIO(content)).verify()  # Never cache an error page as an image
+    conn.execute("INSERT OR REPLACE INTO imagery VALUES (?, ?, ?, ?, ?)",
+                 (key, content, content_type, time.time(), len(content)))
+    _evict_cache_entries(conn, table="imagery", max_bytes=EARTH_IMAGERY_CACHE_MAX_BYTES)
+    return content, content_type
+
+
+def fetch_earth_scene(api_key, lat, lon, date, dim=0.15, display_size=EARTH_DISPLAY_SIZE):
+    # Imagery downloads on a worker thread while the assets lookup runs here. Only a display-sized
+    # preview is returned; the original stays in the imagery cache under "source" for downloads.
+    # Returns ({"preview", "preview_type", "content_type", "size", "source"}, params, assets)
+    # or ({"error": ...}, None, assets)
+    params = {"lon": lon, "lat": lat, "date": date, "dim": dim}
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        imagery = pool.submit(fetch_earth_imagery_bytes, api_key, lat, lon, date, dim)
+        assets = fetch_earth_assets(api_key, lat, lon, date)
+        try:
+            content, content_type = imagery.result()
+            size = Image.open(BytesIO(content)).size  # Reads the header only
+            preview = make_thumbnail(content, display_size)
+        except requests.RequestException as e:
+            return {"error": f"Failed to fetch image: {str(e)}"}, None, assets
+        except IOError as e:
+            return {"error": f"Failed to process image: {str(e)}"}, None, assets
+    return {"preview": preview, "preview_type": f"image/{THUMBNAIL_FORMAT.lower()}", "content_type": content_type,
+            "size": size, "source": (lat, lon, date, dim)}, params, assets
+
+
+EARTH_MOSAIC_MAX_TILES = int(os.environ.get("NASA_MOSAIC_MAX_TILES", 100))
+EARTH_MOSAIC_WORKERS = 6
+EARTH_IMAGERY_REQUESTS_PER_HOUR = int(os.environ.get("NASA_IMAGERY_REQUESTS_PER_HOUR", 1000))
+EARTH_MOSAIC_MAX_WIDTH = 2048
+
+_imagery_budget = None
+_imagery_budget_lock = threading.Lock()
+
+
+def _earth_imagery_budget():
+    # One budget for every session and every batch of imagery, since they usually share an API key
+    global _imagery_budget
+    with _imagery_budget_lock:
+        if _imagery_budget is None:
+            _imagery_budget = RateBudget(EARTH_IMAGERY_REQUESTS_PER_HOUR, burst=EARTH_MOSAIC_MAX_TILES)
+        return _imagery_budget
+
+
+def earth_mosaic_grid(south, west, north, east, dim):
+    # Tiles sit on a fixed global grid of dim-sized cells, so moving or resizing the area reuses
+    # tiles that were already fetched. Returns the snapped bounds and the tile centres, north row first.
+    first_row, last_row = math.floor(south / dim), max(math.ceil(north / dim), math.floor(south / dim) + 1)
+    first_column, last_column = math.floor(west / dim), max(math.ceil(east / dim), math.floor(west / dim) + 1)
+    tiles = [(last_row - 1 - row, column - first_column, round((row + 0.5) * dim, 6), round((column + 0.5) * dim, 6))
+             for row in range(last_row - 1, first_row - 1, -1) for column in range(first_column, last_column)]
+    bounds = (first_row * dim, first_column * dim, last_row * dim, last_column * dim)
+    return bounds, last_row - first_row, last_column - first_column, tiles
+
+
+def build_earth_mosaic(api_key, south, west, north, east, date, dim=0.15, max_width=EARTH_MOSAIC_MAX_WIDTH,
+                       progress=None):
+    # Tiles are fetched concurrently and pasted into a display-sized canvas as they arrive, so only a
+    # few full-resolution tiles are ever in memory. Returns the same shape as fetch_earth_scene's image.
+    bounds, rows, columns, tiles = earth_mosaic_grid(south, west, north, east, dim)
+    if len(tiles) > EARTH_MOSAIC_MAX_TILES:
+        return {"error": f"That area needs {len(tiles)} tiles; the limit is {EARTH_MOSAIC_MAX_TILES}. "
+                         f"Choose a smaller area or a larger tile size."}
+
+    cell = max(1, max_width // max(rows, columns))  # Longest side of the canvas stays within max_width
+    canvas = Image.new("RGB", (cell * columns, cell * rows), (64, 64, 64))
+    budget = _earth_imagery_budget()
+    failed = []
+    with ThreadPoolExecutor(max_workers=min(EARTH_MOSAIC_WORKERS, len(tiles))) as pool:
+        futures = {pool.submit(fetch_earth_imagery_bytes, api_key, lat, lon, date, dim, budget): (row, column, lat, lon)
+                   for row, column, lat, lon in tiles}
+        for done, future in enumerate(as_completed(futures), 1):
+            row, column, lat, lon = futures.pop(future)  # Drop the future so its bytes can be freed
+            try:
+                tile = Image.open(BytesIO(future.result()[0]))
+                tile.draft("RGB", (cell, cell))  # Cheap DCT scaling for JPEG tiles
+                canvas.paste(tile.convert("RGB").resize((cell, cell), reducing_gap=2.0), (column * cell, row * cell))
+            except (requests.RequestException, IOError):
+                failed.append((lat, lon))
+            if progress is not None:
+                progress(done, len(tiles))
+
+    if len(failed) == len(tiles):
+        return {"error": f"Failed to fetch any of the {len(tiles)} tiles for {date}"}
+    buffer = BytesIO()
+    canvas.save(buffer, format="PNG")
+    south, west, north, east = bounds
+    content = buffer.getvalue()
+    return {"content": content, "content_type": "image/png", "preview": content, "preview_type": "image/png",
+            "size": canvas.size, "bounds": [[south, west], [north, east]], "tiles": len(tiles), "failed": failed}
+
+
+EARTH_ASSETS_URL = "https://api.nasa.gov/planetary/earth/assets"
+EARTH_REVISIT_DAYS = 16  # Landsat 8 passes over the same spot every 16 days
+EARTH_SERIES_WORKERS = 6
+EARTH_SERIES_MAX_FRAMES = 48
+EARTH_SERIES_FRAME_SIZE = 512
+
+
+def discover_earth_dates(api_key, lat, lon, start_date, end_date, dim=0.15):
+    # The assets endpoint returns the pass closest to a date, so probing once per revisit
+    # cycle and de-duplicating the answers finds every pass in the range
+    start, end = datetime.strptime(start_date, "%Y-%m-%d"), datetime.strptime(end_date, "%Y-%m-%d")
+    probes = [start + timedelta(days=offset) for offset in range(0, (end - start).days + 1, EARTH_REVISIT_DAYS)]
+    probes.append(end)
+
+    def closest_pass(day):
+        params = {"lat": lat, "lon": lon, "date": day.strftime("%Y-%m-%d"), "dim": dim, "api_key": api_key}
+        try:
+            return cached_get_json(EARTH_ASSETS_URL, params=params).get("date", "")[:10]
+        except (requests.RequestException, ValueError):
+            return ""
+
+    with ThreadPoolExecutor(max_workers=min(EARTH_SERIES_WORKERS, len(probes))) as pool:
+        found = set(pool.map(closest_pass, probes))
+    return sorted(day for day in found if start_date <= day <= end_date)
+
+
+def fetch_earth_series(api_key, lat, lon, dates, dim=0.15, frame_size=EARTH_SERIES_FRAME_SIZE, progress=None):
+    # Every scene fetched concurrently (and cached like single images), reduced to display-sized frames.
+    # Returns {"dates": [...], "frames": [...], "failed": [...]} in date order.
+    dates = list(dates)[-EARTH_SERIES_MAX_FRAMES:]
+    if not dates:
+        return {"dates": [], "frames": [], "failed": []}
+    budget = _earth_imagery_budget()
+    frames, failed = {}, []
+    with ThreadPoolExecutor(max_workers=min(EARTH_SERIES_WORKERS, len(dates))) as pool:
+        futures = {pool.submit(fetch_earth_imagery_bytes, api_key, lat, lon, day, dim, budget): day for day in dates}
+        for done, future in enumerate(as_completed(futures), 1):
+            day = futures.pop(future)
+            try:
+                frames[day] = make_thumbnail(future.result()[0], frame_size, "PNG")
+            except (requests.RequestException, IOError):
+                failed.append(day)
+            if progress is not None:
+                progress(done, len(dates))
+    ordered = sorted(frames)
+    return {"dates": ordered, "frames": [frames[day] for day in ordered], "failed": sorted(failed)}
+
+
+def build_animation(frames, image_format="GIF", frame_duration=500):
+    # Frames are the small PNGs from fetch_earth_series; all are fitted to the first one's size
+    images = [Image.open(BytesIO(frame)).convert("RGB") for frame in frames]
+    size = images[0].size
+    images = [image if image.size == size else image.resize(size) for image in images]
+    output = BytesIO()
+    images[0].save(output, format=image_format, save_all=True, append_images=images[1:], duration=frame_duration,
+                   loop=0)
+    return output.getvalue()
+
+
+def select_map_area(lat, lon, key="area_map", height=300):
+    # Map with a rectangle tool; returns (south, west, north, east) of the last drawn rectangle, or None
+    m = folium.Map(location=[lat, lon], zoom_start=8)
+    Draw(draw_options={"rectangle": True, "polyline": False, "polygon": False, "circle": False,
+                       "marker": False, "circlemarker": False},
+         edit_options={"edit": False}).add_to(m)
+    state = st_folium(m, key=key, width=None, height=height, returned_objects=["last_active_drawing"])
+    drawing = (state or {}).get("last_active_drawing")
+    if not drawing or drawing.get("geometry", {}).get("type") != "Polygon":
+        return None
+    points = np.asarray(drawing["geometry"]["coordinates"][0], dtype=np.float64)
+    return points[:, 1].min(), points[:, 0].min(), points[:, 1].max(), points[:, 0].max()
+
+
+MARS_PREFETCH_PAGES = 3
+MARS_PREFETCH_WORKERS = 4
+
+_prefetch_pool = None
+_prefetching = set()
+_prefetch_lock = threading.Lock()
+
+
+def prefetch_rover_pages(api_key, rover, date_param, camera, pages):
+    # Fire-and-forget: the pages land in the response cache, so flipping to them later is instant
+    global _prefetch_pool
+    with _prefetch_lock:
+        if _prefetch_pool is None:
+            _prefetch_pool = ThreadPoolExecutor(max_workers=MARS_PREFETCH_WORKERS, thread_name_prefix="mars-prefetch")
+
+    def prefetch(page, key):
+        try:
+            fetch_mars_rover_photos(api_key, rover, date_param, camera, page)
+        finally:
+            with _prefetch_lock:
+                _prefetching.discard(key)
+
+    for page in pages:
+        key = (rover.lower(), date_param, camera, page)
+        with _prefetch_lock:
+            if key in _prefetching:
+                continue
+            _prefetching.add(key)
+        _prefetch_pool.submit(prefetch, page, key)
+
+
+def _display_rover_info(photos):
+    st.subheader("Rover Information")
+    rover_info = photos[0]["rover"]
+    st.write(f"Rover Name: {rover_info['name']}")
+    st.write(f"Landing Date: {rover_info['landing_date']}")
+    st.write(f"Launch Date: {rover_info['launch_date']}")
+    st.write(f"Status: {rover_info['status']}")
+
+
+def _display_photo_grid(photos, first_number=1):
+    display_thumbnail_grid([(photo["img_src"], f"Photo {first_number + i} - Camera: {photo['camera']['full_name']}")
+                            for i, photo in enumerate(photos)])
+
+
+def _photos_download_button(photos, rover):
+    # Create a dataframe of all photos for download
+    photos_df = pd.DataFrame(photos)
+    csv = photos_df.to_csv(index=False)
+    st.download_button(
+        label="Download photo data as CSV",
+        data=csv,
+        file_name=f"{rover}_photos.csv",
+        mime="text/csv",
+    )
 
 
 # Function to fetch and display photos
-def fetch_and_display_photos(api_key, rover, date_param, camera_param, page):
-    url = f"https://api.nasa.gov/mars-photos/api/v1/rovers/{rover.lower()}/photos?{date_param}{camera_param}&page={page}&api_key={api_key}"
+def fetch_and_display_photos(api_key, rover, date_param, camera_param, page, page_count=None,
+                             prefetch=MARS_PREFETCH_PAGES):
+    camera = camera_param.split("=", 1)[1] if camera_param else None
 
     with st.spinner("Fetching Mars Rover photos..."):
-        try:
-            response = requests.get(url)
-            response.raise_for_status()  # This will raise an HTTPError for bad responses
+        data = fetch_mars_rover_photos(api_key, rover, date_param, camera, page)
 
-            data = response.json()
-            photos = data.get("photos", [])
+    if "error" in data:
+        st.error(data["error"]["message"])
+        return
+    photos = data.get("photos", [])
 
-            if len(photos) == 0:
-                st.warning(f"No photos available for the selected criteria. Try different parameters.")
-            else:
-                st.success(f"Found {len(photos)} photos")
+    # A full page means there are probably more, so start fetching them while this one renders
+    if len(photos) == MARS_PHOTOS_PER_PAGE:
+        last_page = page + prefetch if page_count is None else min(page + prefetch, page_count)
+        prefetch_rover_pages(api_key, rover, date_param, camera, range(page + 1, last_page + 1))
+
+    if len(photos) == 0:
+        st.warning("No photos available for the selected criteria. Try different parameters.")
+    else:
+        st.success(f"Found {len(photos)} photos")
+        _display_rover_info(photos)
+
+        # Display photos
+        st.subheader("Photos")
+        _display_photo_grid(photos, first_number=(page - 1) * MARS_PHOTOS_PER_PAGE + 1)
+        _photos_download_button(photos, rover)
+
+
+def fetch_and_display_all_photos(api_key, rover, date_param, camera_param, page_count=None):
+    camera = camera_param.split("=", 1)[1] if camera_param else None
+    status = st.empty()
+    info = st.container()
+    st.subheader("Photos")
+    grid = st.container()
+
+    # Pages are fetched in waves on a bounded pool; each page gets its own slot in the grid
+    # (so the order is kept) and is drawn the moment it arrives
+    pages_photos, errors = {}, []
+    next_page, finished = 1, False
+    with ThreadPoolExecutor(max_workers=MARS_PREFETCH_WORKERS) as pool:
+        while not finished and (page_count is None or next_page <= page_count):
+            last_page = next_page + MARS_PREFETCH_WORKERS - 1
+            if page_count is not None:
+                last_page = min(last_page, page_count)
+            wave = range(next_page, last_page + 1)
+            slots = {page: grid.container() for page in wave}
+            futures = {pool.submit(fetch_mars_rover_photos, api_key, rover, date_param, camera, page): page
+                       for page in wave}
+            for future in as_completed(futures):
+                page = futures[future]
+                data = future.result()
+                if "error" in data:
+                    errors.append(data["error"]["message"])
+                    finished = True
+                    continue
+                photos = data.get("photos", [])
+                pages_photos[page] = photos
+                if len(photos) < MARS_PHOTOS_PER_PAGE:
+                    finished = True  # A short page is the last one
+                with slots[page]:
+                    _display_photo_grid(photos, first_number=(page - 1) * MARS_PHOTOS_PER_PAGE + 1)
+                status.info(f"Loaded {sum(len(p) for p in pages_photos.values())} photos from "
+                            f"{len(pages_photos)} pages...")
+            next_page = last_page + 1
+
+    photos = [photo for page in sorted(pages_photos) for photo in pages_photos[page]]
+    for message in errors:
+        st.error(message)
+    if not photos:
+        status.warning("No photos available for the selected criteria. Try different parameters.")
+        return
+    status.success(f"Found {len(photos)} photos")
+    with info:
+        _display_rover_info(photos)
+    _photos_download_button(photos, rover)
+
+
+MARS_MANIFEST_URL = "https://api.nasa.gov/mars-photos/api/v1/manifests/{}"
+MARS_PHOTOS_URL = "https://api.nasa.gov/mars-photos/api/v1/rovers/{}/photos"
+MARS_PHOTOS_PER_PAGE = 25
+MARS_SOL_IN_EARTH_DAYS = 1.0274912517  # 24h 39m 35s
+CURIOSITY_LANDING_DATE = datetime(2012, 8, 6).date()
+
+
+@st.cache_resource(ttl=6 * 3600, show_spinner=False)  # Refresh every 6 hours
+def _rover_manifest_index(rover, _api_key):
+    manifest = cached_get_json(MARS_MANIFEST_URL.format(rover.lower()), params={"api_key": _api_key})
+    manifest = manifest["photo_manifest"]
+    sols, dates = {}, {}
+    for entry in manifest["photos"]:
+        earth_date = datetime.strptime(entry["earth_date"], "%Y-%m-%d").date()
+        sols[entry["sol"]] = {"earth_date": earth_date, "total_photos": entry["total_photos"],
+                              "cameras": frozenset(entry["cameras"])}
+        dates[earth_date] = entry["sol"]
+    return {
+        "name": manifest["name"],
+        "status": manifest["status"],
+        "landing_date": datetime.strptime(manifest["landing_date"], "%Y-%m-%d").date(),
+        "max_sol": manifest["max_sol"],
+        "max_date": datetime.strptime(manifest["max_date"], "%Y-%m-%d").date(),
+        "total_photos": manifest["total_photos"],
+        "sols": sols,
+        "dates": dates,
+    }
 
-                # Display some metadata
+
+def fetch_rover_manifest(api_key, rover):
+    try:
+        return _rover_manifest_index(rover, api_key)
+    except (requests.RequestException, ValueError, KeyError) as e:
+        return {"error": {"message": f"Failed to fetch mission manifest: {str(e)}"}}
+
+
+def sol_to_earth_date(manifest, sol):
+    # Exact for sols with photos, otherwise computed from the length of a sol
+    if manifest and sol in manifest["sols"]:
+        return manifest["sols"][sol]["earth_date"]
+    landing_date = manifest["landing_date"] if manifest else CURIOSITY_LANDING_DATE
+    return landing_date + timedelta(days=int(sol * MARS_SOL_IN_EARTH_DAYS))
+
+
+def earth_date_to_sol(manifest, earth_date):
+    if manifest and earth_date in manifest["dates"]:
+        return manifest["dates"][earth_date]
+    landing_date = manifest["landing_date"] if manifest else CURIOSITY_LANDING_DATE
+    return max(0, int((earth_date - landing_date).days / MARS_SOL_IN_EARTH_DAYS))
+
+
+def rover_sol_cameras(manifest, sol):
+    if not manifest:
+        return None  # Unknown without a manifest
+    entry = manifest["sols"].get(sol)
+    return entry["cameras"] if entry else frozenset()
+
+
+def rover_page_count(manifest, sol, camera="All"):
+    # The manifest only counts photos per sol, so for a single camera this is an upper bound
+    if not manifest:
+        return None
+    entry = manifest["sols"].get(sol)
+    if entry is None or (camera != "All" and camera not in entry["cameras"]):
+        return 0
+    return max(1, math.ceil(entry["total_photos"] / MARS_PHOTOS_PER_PAGE))
+
+
+# Offline Mars photo metadata: one Parquet dataset per rover, each with one sol=N partition per sol
+MARS_DATASET_DIR = os.path.join(RESPONSE_CACHE_DIR, "mars_photos")
+MARS_HARVEST_WORKERS = 4
+MARS_HARVEST_REQUESTS_PER_HOUR = 900  # Leaves headroom under api.nasa.gov's 1000/hour per key
+MARS_HARVEST_REFRESH_SOLS = 7  # Recent sols keep receiving photos as data is downlinked
+MARS_PHOTO_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("sol", pa.int32()),
+    ("earth_date", pa.date32()),
+    ("img_src", pa.string()),
+    ("camera_id", pa.int32()),
+    ("camera_name", pa.dictionary(pa.int8(), pa.string())),
+    ("camera_full_name", pa.dictionary(pa.int8(), pa.string())),
+    ("rover_id", pa.int32()),
+    ("rover_name", pa.dictionary(pa.int8(), pa.string())),
+    ("rover_landing_date", pa.date32()),
+    ("rover_launch_date", pa.date32()),
+    ("rover_status", pa.dictionary(pa.int8(), pa.string())),
+])
+
+
+class RateBudget:
+    # Spaces requests evenly so a long harvest never runs through the hourly quota;
+    # burst lets that many requests go out back to back after an idle spell
+    def __init__(self, requests_per_hour, burst=1):
+        self.interval = 3600.0 / requests_per_hour
+        self.slack = (burst - 1) * self.interval
+        self.next_slot = time.monotonic() - self.slack
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now - self.slack, self.next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def rover_dataset_dir(rover):
+    return os.path.join(MARS_DATASET_DIR, rover.lower())
+
+
+def flatten_rover_photos(photos):
+    columns = {
+        "id": [photo["id"] for photo in photos],
+        "sol": [photo["sol"] for photo in photos],
+        "earth_date": [datetime.strptime(photo["earth_date"], "%Y-%m-%d").date() for photo in photos],
+        "img_src": [photo["img_src"] for photo in photos],
+        "camera_id": [photo["camera"]["id"] for photo in photos],
+        "camera_name": [photo["camera"]["name"] for photo in photos],
+        "camera_full_name": [photo["camera"]["full_name"] for photo in photos],
+        "rover_id": [photo["rover"]["id"] for photo in photos],
+        "rover_name": [photo["rover"]["name"] for photo in photos],
+        "rover_landing_date": [datetime.strptime(photo["rover"]["landing_date"], "%Y-%m-%d").date()
+                               for photo in photos],
+        "rover_launch_date": [datetime.strptime(photo["rover"]["launch_date"], "%Y-%m-%d").date()
+                              for photo in photos],
+        "rover_status": [photo["rover"]["status"] for photo in photos],
+    }
+    return pa.Table.from_pydict(columns).cast(MARS_PHOTO_SCHEMA)
+
+
+def _harvest_sol(api_key, rover, sol, page_count, budget):
+    # Straight to the API: tens of thousands of one-off pages would only push real users' entries
+    # out of the shared response cache
+    url = MARS_PHOTOS_URL.format(rover.lower())
+    photos, page = [], 1
+    while page_count is None or page <= page_count:
+        budget.wait()
+        response = http_get(url, params={"api_key": api_key, "sol": sol, "page": page})
+        response.raise_for_status()
+        page_photos = response.json().get("photos", [])
+        photos.extend(page_photos)
+        if len(page_photos) < MARS_PHOTOS_PER_PAGE:
+            break
+        page += 1
+    return photos
+
+
+def _write_sol_partition(dataset_dir, sol, photos):
+    partition_dir = os.path.join(dataset_dir, f"sol={sol}")
+    os.makedirs(partition_dir, exist_ok=True)
+    # Hidden name, so dataset discovery never picks up a half-written (or crashed) file
+    tmp_path = os.path.join(partition_dir, f".part-0.parquet.{os.getpid()}.{threading.get_ident()}.tmp")
+    # The sol lives in the partition path, so it isn't repeated inside the file
+    pq.write_table(flatten_rover_photos(photos).drop_columns(["sol"]), tmp_path, compression="zstd")
+    os.replace(tmp_path, os.path.join(partition_dir, "part-0.parquet"))
+
+
+def _load_harvest_checkpoint(dataset_dir):
+    try:
+        with open(os.path.join(dataset_dir, "_checkpoint.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"rover": None, "completed_sols": {}, "sol_dates": {}}
+
+
+def _save_harvest_checkpoint(dataset_dir, checkpoint):
+    path = os.path.join(dataset_dir, "_checkpoint.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+
+def harvest_rover_photos(api_key, rover="Curiosity", dataset_dir=None, first_sol=0, last_sol=None,
+                         max_workers=MARS_HARVEST_WORKERS, requests_per_hour=MARS_HARVEST_REQUESTS_PER_HOUR,
+                         refresh_sols=MARS_HARVEST_REFRESH_SOLS, progress=None):
+    # The app reads rover_dataset_dir(rover); another dataset_dir is only useful outside it
+    if dataset_dir is None:
+        dataset_dir = rover_dataset_dir(rover)
+    manifest = fetch_rover_manifest(api_key, rover)
+    if "error" in manifest:
+        raise requests.RequestException(manifest["error"]["message"])
+    if last_sol is None:
+        last_sol = manifest["max_sol"]
+
+    # The checkpoint records each finished sol with its photo count. Sols whose count still
+    # matches the manifest are skipped, and the newest few sols are always fetched again.
+    checkpoint = _load_harvest_checkpoint(dataset_dir)
+    if checkpoint["rover"] not in (None, manifest["name"]):
+        raise ValueError(f"{dataset_dir} holds {checkpoint['rover']} photos, not {manifest['name']}")
+    os.makedirs(dataset_dir, exist_ok=True)
+    checkpoint["rover"] = manifest["name"]
+    # What the manifest said at harvest time, so readers can tell which sols are complete and settled
+    checkpoint["max_sol"] = manifest["max_sol"]
+    checkpoint["refresh_sols"] = refresh_sols
+    checkpoint["manifest_photos"] = {str(sol): entry["total_photos"] for sol, entry in manifest["sols"].items()}
+    completed = checkpoint["completed_sols"]
+    sol_dates = checkpoint.setdefault("sol_dates", {})
+    sols = []
+    for sol, entry in sorted(manifest["sols"].items()):
+        if not first_sol <= sol <= last_sol:
+            continue
+        if completed.get(str(sol)) == entry["total_photos"] and sol <= manifest["max_sol"] - refresh_sols:
+            continue
+        sols.append((sol, math.ceil(entry["total_photos"] / MARS_PHOTOS_PER_PAGE)))
+
+    _save_harvest_checkpoint(dataset_dir, checkpoint)
+    budget = RateBudget(requests_per_hour)
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_harvest_sol, api_key, rover, sol, page_count, budget): sol
+                   for sol, page_count in sols}
+        for done, future in enumerate(as_completed(futures), 1):
+            sol = futures[future]
+            try:
+                photos = future.result()
+            except (requests.RequestException, ValueError):
+                failed.append(sol)
+            else:
                 if photos:
-                    st.subheader("Rover Information")
-                    rover_info = photos[0]["rover"]
-                    st.write(f"Rover Name: {rover_info['name']}")
-                    st.write(f"Landing Date: {rover_info['landing_date']}")
-                    st.write(f"Launch Date: {rover_info['launch_date']}")
-                    st.write(f"Status: {rover_info['status']}")
-
-                # Display photos
-                st.subheader("Photos")
-                cols = st.columns(3)
-                for i, photo in enumerate(photos):
-                    with cols[i % 3]:
-                        st.image(photo["img_src"], caption=f"Photo {i + 1} - Camera: {photo['camera']['full_name']}")
-
-                # Create a dataframe of all photos for download
-                photos_df = pd.DataFrame(photos)
-                csv = photos_df.to_csv(index=False)
-                st.download_button(
-                    label="Download photo data as CSV",
-                    data=csv,
-                    file_name=f"{rover}_photos.csv",
-                    mime="text/csv",
-                )
-        except requests.RequestException as e:
-            st.error(f"Error fetching data: {str(e)}")
-        except ValueError as e:
-            st.error(f"Error processing data: {str(e)}")
+                    _write_sol_partition(dataset_dir, sol, photos)
+                completed[str(sol)] = len(photos)
+                sol_dates[str(sol)] = manifest["sols"][sol]["earth_date"].isoformat()
+                _save_harvest_checkpoint(dataset_dir, checkpoint)
+            if progress:
+                progress(done, len(sols), sol)
+    return sorted(failed)
+
+
+def _local_mars_checkpoint(dataset_dir):
+    path = os.path.join(dataset_dir, "_checkpoint.json")
+    version = _path_version(path)
+    if version is None:
+        return None
+
+    def load():
+        checkpoint = _load_harvest_checkpoint(dataset_dir)
+        checkpoint["date_sols"] = {date: int(sol) for sol, date in checkpoint.get("sol_dates", {}).items()}
+        return checkpoint
+
+    return _cached_local(("mars_checkpoint", dataset_dir), version, load)
+
+
+def query_local_rover_photos(rover, date_param, camera=None, page=1):
+    # Same shape as the API response, or None if the harvested dataset doesn't cover the request
+    dataset_dir = rover_dataset_dir(rover)
+    checkpoint = _local_mars_checkpoint(dataset_dir)
+    if not checkpoint or (checkpoint.get("rover") or "").lower() != rover.lower():
+        return None
+    key, value = date_param.split("=", 1)
+    if key == "sol":
+        sol = int(value)
+    else:
+        sol = checkpoint["date_sols"].get(value)
+    # Only sols that are past the refresh window and were harvested in full; recent or short sols
+    # may still be receiving photos, so those go to the API
+    settled_through = checkpoint.get("max_sol", -1) - checkpoint.get("refresh_sols", MARS_HARVEST_REFRESH_SOLS)
+    if sol is None or sol > settled_through:
+        return None
+    harvested = checkpoint["completed_sols"].get(str(sol))
+    if harvested is None or harvested != checkpoint.get("manifest_photos", {}).get(str(sol)):
+        return None
+
+    expression = ds.field("sol") == sol
+    if camera and camera != "All":
+        expression &= ds.field("camera_name") == camera.upper()
+    dataset = open_local_dataset(dataset_dir)
+    if dataset is None or "sol" not in dataset.schema.names:
+        return None  # Nothing written yet, e.g. only empty sols have been harvested
+    table = dataset.to_table(filter=expression)
+    table = table.sort_by("id").slice((page - 1) * MARS_PHOTOS_PER_PAGE, MARS_PHOTOS_PER_PAGE)
+
+    photos = []
+    for row in table.to_pylist():
+        photos.append({
+            "id": row["id"],
+            "sol": row["sol"],
+            "camera": {"id": row["camera_id"], "name": row["camera_name"], "rover_id": row["rover_id"],
+                       "full_name": row["camera_full_name"]},
+            "img_src": row["img_src"],
+            "earth_date": row["earth_date"].isoformat(),
+            "rover": {"id": row["rover_id"], "name": row["rover_name"],
+                      "landing_date": row["rover_landing_date"].isoformat(),
+                      "launch_date": row["rover_launch_date"].isoformat(), "status": row["rover_status"]},
+        })
+    return {"photos": photos}
 
 
 def get_camera_options():
@@ -197,17 +2132,17 @@ def get_camera_options():
     }
 
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
 def fetch_earth_assets(api_key, lat, lon, date):
     url = f"https://api.nasa.gov/planetary/earth/assets"
     params = {
         "lon": lon,
         "lat": lat,
-        "date": date,
-        "api_key": api_key
+        "date": date
     }
-    response = requests.get(url, params=params)
-    return response.json()
+    try:
+        return _shared_get_json(url, params, api_key)
+    except (requests.RequestException, ValueError) as e:
+        return {"error": {"message": f"Failed to fetch data: {str(e)}"}}
 
 
 def create_ufo_image():
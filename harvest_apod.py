@@ -0,0 +1,24 @@
+import argparse
+import os
+from functions import harvest_apod_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror the full APOD archive into a local Parquet file.")
+    parser.add_argument("--api-key", default=os.environ.get("NASA_API_KEY", "DEMO_KEY"))
+    parser.add_argument("--chunk-days", type=int, default=90, help="Days per upstream range request")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests")
+    args = parser.parse_args()
+
+    def report(done, total):
+        print(f"\r{done}/{total} chunks", end="", flush=True)
+
+    failed = harvest_apod_archive(args.api_key, chunk_days=args.chunk_days, max_workers=args.workers,
+                                  progress=report)
+    print()
+    for start, end in failed:
+        print(f"Failed: {start} to {end} (run again to resume)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import os
+from functions import (harvest_rover_photos, rover_dataset_dir, MARS_HARVEST_WORKERS, MARS_HARVEST_REQUESTS_PER_HOUR,
+                       MARS_HARVEST_REFRESH_SOLS)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Harvest Mars rover photo metadata into a Parquet dataset partitioned by sol. "
+                    "Interrupted runs resume from the checkpoint; later runs only fetch new sols. "
+                    "Each rover gets its own dataset under NASA_CACHE_DIR/mars_photos, where the app reads it.")
+    parser.add_argument("--api-key", default=os.environ.get("NASA_API_KEY", "DEMO_KEY"))
+    parser.add_argument("--rover", default="Curiosity")
+    parser.add_argument("--first-sol", type=int, default=0)
+    parser.add_argument("--last-sol", type=int, default=None, help="Defaults to the latest sol in the manifest")
+    parser.add_argument("--workers", type=int, default=MARS_HARVEST_WORKERS, help="Concurrent requests")
+    parser.add_argument("--requests-per-hour", type=int, default=MARS_HARVEST_REQUESTS_PER_HOUR)
+    parser.add_argument("--refresh-sols", type=int, default=MARS_HARVEST_REFRESH_SOLS,
+                        help="Always re-fetch this many of the newest sols")
+    args = parser.parse_args()
+
+    def report(done, total, sol):
+        print(f"\r{done}/{total} sols (last finished: sol {sol})", end="", flush=True)
+
+    print(f"Harvesting into {rover_dataset_dir(args.rover)}")
+    try:
+        failed = harvest_rover_photos(args.api_key, rover=args.rover, first_sol=args.first_sol,
+                                      last_sol=args.last_sol, max_workers=args.workers,
+                                      requests_per_hour=args.requests_per_hour, refresh_sols=args.refresh_sols,
+                                      progress=report)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    print()
+    if failed:
+        print(f"Failed sols (run again to resume): {', '.join(map(str, failed))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+from io import BytesIO
+
+from PIL import Image
+
+import functions
+
+
+def _png(width=64, height=64):
+    output = BytesIO()
+    Image.new("RGB", (width, height), (10, 120, 30)).save(output, format="PNG")
+    return output.getvalue()
+
+
+def test_grid_snaps_to_global_cells():
+    bounds, rows, columns, tiles = functions.earth_mosaic_grid(29.5, -95.6, 30.1, -95.0, 0.15)
+    assert (rows, columns) == (5, 5)
+    assert len(tiles) == 25
+    south, west, north, east = bounds
+    assert south <= 29.5 and north >= 30.1 and west <= -95.6 and east >= -95.0
+    # North row first, so row 0 holds the largest latitude
+    assert tiles[0][:2] == (0, 0) and tiles[0][2] > tiles[-1][2]
+
+
+def test_shifted_area_reuses_tile_centres():
+    _, _, _, first = functions.earth_mosaic_grid(29.5, -95.6, 30.1, -95.0, 0.15)
+    _, _, _, shifted = functions.earth_mosaic_grid(29.6, -95.5, 30.2, -94.9, 0.15)
+    shared = {tile[2:] for tile in first} & {tile[2:] for tile in shifted}
+    assert len(shared) == 16
+
+
+def test_tall_narrow_area_keeps_canvas_within_max_width(monkeypatch):
+    monkeypatch.setattr(functions, "fetch_earth_imagery_bytes", lambda *args: (_png(), "image/png"))
+    _, rows, columns, _ = functions.earth_mosaic_grid(0.0, 0.0, 1.0, 0.01, 0.01)
+    assert (rows, columns) == (100, 1)
+
+    mosaic = functions.build_earth_mosaic("DEMO_KEY", 0.0, 0.0, 1.0, 0.01, "2024-01-01", dim=0.01, max_width=2048)
+    width, height = mosaic["size"]
+    assert max(width, height) <= 2048
+    assert height == 100 * width
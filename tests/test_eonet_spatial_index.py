@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+import functions
+
+
+def _frame(lat, lon):
+    return pd.DataFrame({"lat": np.asarray(lat, dtype=np.float32), "lon": np.asarray(lon, dtype=np.float32)})
+
+
+def test_candidates_across_the_antimeridian():
+    lat = [10.0, 10.0, 10.0, 10.0, 10.0, np.nan]
+    lon = [179.5, -179.5, 175.0, -175.0, 0.0, 179.9]
+    index = functions.build_spatial_index(lat, lon)
+    # west > east: the box wraps from 178E through 180 to 178W
+    candidates = set(functions._index_candidates(index, 5.0, 178.0, 15.0, -178.0).tolist())
+    assert {0, 1} <= candidates
+    assert not candidates & {4, 5}
+
+
+def test_bbox_mask_across_the_antimeridian_matches_a_scan():
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(-90, 90, 5000), rng.uniform(-180, 180, 5000)
+    frame = _frame(lat, lon)
+    mask = functions.eonet_bbox_mask(frame, (-20.0, 170.0, 20.0, 190.0))
+    lat, lon = frame["lat"].to_numpy(), frame["lon"].to_numpy()
+    expected = (lat >= -20) & (lat <= 20) & ((lon >= 170) | (lon <= -170))
+    assert mask.sum() > 0
+    assert np.array_equal(mask, expected)
+
+
+def test_radius_mask_across_the_antimeridian():
+    frame = _frame([0.0, 0.0, 0.0], [179.9, -179.9, 170.0])
+    mask = functions.eonet_radius_mask(frame, 0.0, 180.0, 50)
+    assert mask.tolist() == [True, True, False]
+
+
+def test_spatial_index_is_cached_per_frame():
+    frame = _frame([1.0, 2.0], [3.0, 4.0])
+    assert functions.eonet_spatial_index(frame) is functions.eonet_spatial_index(frame)
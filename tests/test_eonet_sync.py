@@ -0,0 +1,63 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+import functions
+
+
+def _fresh_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(functions, "RESPONSE_CACHE_DIR", str(tmp_path))
+    monkeypatch.delattr(functions._cache_local, "conn", raising=False)
+
+
+def _fake_api(monkeypatch, calls):
+    def http_get(url, params=None, **kwargs):
+        calls.append(params)
+        time.sleep(0.2)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"events": []}'
+        return response
+
+    monkeypatch.setattr(functions, "http_get", http_get)
+
+
+def test_concurrent_syncs_fetch_once(monkeypatch, tmp_path):
+    _fresh_store(monkeypatch, tmp_path)
+    calls = []
+    _fake_api(monkeypatch, calls)
+    start = threading.Barrier(4)
+
+    def sync():
+        start.wait()
+        functions.sync_eonet_store()
+
+    threads = [threading.Thread(target=sync) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert "synced_at" in functions.eonet_store_state()
+
+
+def test_sync_claimed_elsewhere_is_skipped(monkeypatch, tmp_path):
+    _fresh_store(monkeypatch, tmp_path)
+    calls = []
+    _fake_api(monkeypatch, calls)
+    functions._cache_db().execute("INSERT INTO eonet_sync VALUES ('sync_started_at', ?)",
+                                  (datetime.utcnow().isoformat(),))
+    assert functions.sync_eonet_store() == 0
+    assert calls == []
+
+
+def test_locked_store_falls_back_to_stored_events(monkeypatch):
+    def locked():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(functions, "sync_eonet_store", locked)
+    monkeypatch.setattr(functions, "query_eonet_store", lambda *args: {"events": []})
+    assert functions.fetch_eonet_events() == {"events": []}
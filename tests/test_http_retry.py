@@ -0,0 +1,71 @@
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+import functions
+
+
+class _ScriptedAdapter(BaseAdapter):
+    def __init__(self, statuses, headers=None):
+        super().__init__()
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.responses = []
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = self.statuses.pop(0)
+        response.headers.update(self.headers if response.status_code == 429 else {})
+        response.url = request.url
+        response.raw = _Body()
+        self.responses.append(response)
+        return response
+
+    def close(self):
+        pass
+
+
+class _Body:
+    closed = False
+
+    def read(self, *args, **kwargs):
+        return b""
+
+    def close(self):
+        self.closed = True
+
+    def release_conn(self):
+        self.close()
+
+
+def _session(adapter):
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+
+def test_retried_responses_are_closed(monkeypatch):
+    adapter = _ScriptedAdapter([429, 503, 200], headers={"Retry-After": "0"})
+    monkeypatch.setattr(functions, "get_http_session", lambda: _session(adapter))
+    monkeypatch.setattr(functions, "_backoff", lambda retry_state: 0)
+
+    response = functions.http_get("https://api.nasa.gov/test", stream=True)
+    assert response.status_code == 200
+    assert [r.raw.closed for r in adapter.responses] == [True, True, False]
+
+
+def test_retry_after_parsing():
+    assert functions._retry_after_seconds("7") == 7.0
+    assert functions._retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert functions._retry_after_seconds("soon") is None
+    assert functions._retry_after_seconds(None) is None
+
+
+def test_long_retry_after_returns_the_429_at_once(monkeypatch):
+    adapter = _ScriptedAdapter([429, 200], headers={"Retry-After": "3600"})
+    monkeypatch.setattr(functions, "get_http_session", lambda: _session(adapter))
+    monkeypatch.setattr(functions.http_get.retry, "sleep", lambda seconds: pytest.fail("slept %s" % seconds))
+
+    response = functions.http_get("https://api.nasa.gov/test")
+    assert response.status_code == 429
+    assert len(adapter.responses) == 1
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+import functions
+
+
+def _photo(sol, index):
+    return {"id": sol * 1000 + index, "sol": sol, "img_src": f"https://mars.nasa.gov/{sol}/{index}.jpg",
+            "earth_date": "2012-08-16", "camera": {"id": 1, "name": "NAVCAM", "full_name": "Navigation Camera"},
+            "rover": {"id": 5, "name": "Curiosity", "landing_date": "2012-08-06", "launch_date": "2011-11-26",
+                      "status": "active"}}
+
+
+def _harvested(monkeypatch, tmp_path, harvested, manifest_photos, max_sol=100):
+    monkeypatch.setattr(functions, "MARS_DATASET_DIR", str(tmp_path))
+    dataset_dir = functions.rover_dataset_dir("Curiosity")
+    for sol, count in harvested.items():
+        functions._write_sol_partition(dataset_dir, sol, [_photo(sol, i) for i in range(count)])
+    functions._save_harvest_checkpoint(dataset_dir, {
+        "rover": "Curiosity", "max_sol": max_sol, "refresh_sols": 7,
+        "completed_sols": {str(sol): count for sol, count in harvested.items()},
+        "manifest_photos": {str(sol): count for sol, count in manifest_photos.items()},
+        "sol_dates": {str(sol): "2012-08-16" for sol in harvested},
+    })
+
+
+def test_settled_complete_sol_is_served_locally(monkeypatch, tmp_path):
+    _harvested(monkeypatch, tmp_path, {10: 30}, {10: 30})
+    page = functions.query_local_rover_photos("Curiosity", "sol=10", page=2)
+    assert [photo["id"] for photo in page["photos"]] == list(range(10025, 10030))
+
+
+def test_recent_or_partial_sols_go_to_the_api(monkeypatch, tmp_path):
+    _harvested(monkeypatch, tmp_path, {10: 20, 95: 30}, {10: 30, 95: 30})
+    assert functions.query_local_rover_photos("Curiosity", "sol=10") is None  # Harvested before all photos arrived
+    assert functions.query_local_rover_photos("Curiosity", "sol=95") is None  # Inside the refresh window
+    assert functions.query_local_rover_photos("Curiosity", "sol=11") is None  # Never harvested
+
+
+def test_rovers_are_kept_apart(monkeypatch, tmp_path):
+    _harvested(monkeypatch, tmp_path, {10: 30}, {10: 30})
+    assert functions.query_local_rover_photos("Perseverance", "sol=10") is None
+
+    manifest = {"name": "Perseverance", "max_sol": 100, "sols": {}}
+    monkeypatch.setattr(functions, "fetch_rover_manifest", lambda api_key, rover: manifest)
+    with pytest.raises(ValueError):
+        functions.harvest_rover_photos("DEMO_KEY", "Perseverance", dataset_dir=functions.rover_dataset_dir("Curiosity"))
+    assert functions.harvest_rover_photos("DEMO_KEY", "Perseverance") == []
+    assert os.path.exists(os.path.join(tmp_path, "perseverance", "_checkpoint.json"))
+    assert functions.query_local_rover_photos("Curiosity", "sol=10") is not None